@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+
+from src.Config import ConfigManager
+
+# Parse the command line argument
+parser = argparse.ArgumentParser(description="Create the missing and stale thumbnails of the whole library")
+parser.add_argument('--profile', help='profile name', default='default')
+parser.add_argument('--size', help='thumbnails size, default: 256', type=int, default=256)
+parser.add_argument('--workers', help='thumbnails created in parallel, default: number of cpus', type=int, default=None)
+parser.add_argument('--batch', help='files read from the database at a time, default: 500', type=int, default=500)
+parser.add_argument('--force', action='store_true', help='recreate the fresh thumbnails too')
+parser.add_argument('--restart', action='store_true', help='ignore the progress of an interrupted run')
+
+args = parser.parse_args()
+
+# Configure the application
+profile_folder = os.path.join(os.environ['HOME'], ".config/tag-manager/" + args.profile)
+ConfigManager.setup(profile_folder)
+
+from src.Thumbnailer import Thumbnailer
+from src.ThumbnailBackfill import ThumbnailBackfill
+
+thumbnailer = Thumbnailer(args.size)
+backfill = ThumbnailBackfill(thumbnailer, workers=args.workers, batch_size=args.batch, force=args.force)
+
+checkpoint = None if args.restart else backfill.loadCheckpoint()
+if checkpoint is not None:
+    print("Resuming after file #%d" % checkpoint)
+stats = backfill.run(restart=args.restart, report=print)
+print("Done: %s" % stats)
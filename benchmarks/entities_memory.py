@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.Config import ConfigManager
+
+# Parse the command line argument
+parser = argparse.ArgumentParser(description="Measure the memory used by the non persistent entities")
+parser.add_argument('--files', help='number of files, default: 100000', type=int, default=100000)
+parser.add_argument('--tags', help='number of tags, default: 2000', type=int, default=2000)
+parser.add_argument('--metatags', help='number of metatags, default: 20', type=int, default=20)
+parser.add_argument('--tags-per-file', help='tags of each file, default: 5', type=int, default=5)
+
+args = parser.parse_args()
+
+ConfigManager.setup(tempfile.mkdtemp(prefix="tag-manager-benchmark-"))
+
+from src.dao.entities.Common import IFile
+from src.dao.entities.Common import IFileLazy
+
+
+# Entities as defined before the __slots__ rewrite
+class LegacyNamed:
+
+    def __init__(self, persistent_entity):
+        self.id = persistent_entity.id
+        self.name = persistent_entity.name
+
+class LegacyFileLazy(LegacyNamed):
+
+    def __init__(self, persistent_entity):
+        super().__init__(persistent_entity)
+        self.relpath = persistent_entity.relpath
+        self.mime = persistent_entity.mime
+
+class LegacyFile(LegacyFileLazy):
+
+    def __init__(self, persistent_entity):
+        super().__init__(persistent_entity)
+        self.tags = []
+        for ptag in persistent_entity.tags:
+            self.tags.append(LegacyTagLazy(ptag))
+
+class LegacyTagLazy(LegacyNamed):
+
+    def __init__(self, persistent_entity):
+        super().__init__(persistent_entity)
+        self.metatag = LegacyNamed(persistent_entity.metatag)
+
+
+def createPersistent():
+    '''
+        Create stand-ins for the persistent files, tags and metatags.
+    '''
+    metatags = [SimpleNamespace(id=i, name="metatag %d" % i) for i in range(args.metatags)]
+    tags = [SimpleNamespace(id=i, name="tag %d" % i, metatag=metatags[i % args.metatags])
+            for i in range(args.tags)]
+    files = []
+    for i in range(args.files):
+        file_tags = [tags[(i * 7 + j * 13) % args.tags] for j in range(args.tags_per_file)]
+        files.append(SimpleNamespace(id=i, name="file %d.mkv" % i, relpath="folder/%d" % (i // 100),
+                                     mime="video/x-matroska", tags=file_tags))
+    return files
+
+def measure(entity, persistent):
+    '''
+        Convert all the persistent files and measure the memory allocated.
+
+        :return: Bytes allocated by the converted entities
+        :rtype: int
+    '''
+    gc.collect()
+    tracemalloc.start()
+    entities = list(map(entity, persistent))
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entities
+    return size
+
+persistent = createPersistent()
+print("%d files, %d tags per file, %d tags, %d metatags" %
+      (args.files, args.tags_per_file, args.tags, args.metatags))
+for label, legacy, current in [("IFileLazy", LegacyFileLazy, IFileLazy), ("IFile", LegacyFile, IFile)]:
+    before = measure(legacy, persistent)
+    after = measure(current, persistent)
+    print("%-10s before: %7.1f MiB  after: %7.1f MiB  (%.0f%%)" %
+          (label, before / 2**20, after / 2**20, 100.0 * after / before))
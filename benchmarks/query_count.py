@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.Config import ConfigManager
+
+# Parse the command line argument
+parser = argparse.ArgumentParser(description="Check that the queries of the DAO getters do not grow with the number of tags")
+parser.add_argument('--tags', help='tags of the large entities, default: 40', type=int, default=40)
+parser.add_argument('--metatags', help='metatags of the tags, default: 10', type=int, default=10)
+
+args = parser.parse_args()
+
+ConfigManager.setup(tempfile.mkdtemp(prefix="tag-manager-benchmark-"))
+
+from sqlalchemy import event
+
+from src.dao import filesDao
+from src.dao import metatagsDao
+from src.dao import tagsDao
+from src.dao.Common import engine
+
+
+class QueryCounter:
+    '''
+        Count the statements executed on the engine.
+    '''
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._onExecute)
+
+    def _onExecute(self, connection, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def measure(self, method):
+        '''
+            Count the statements executed by a function.
+
+            :param callable method: Function to call
+            :rtype: int
+        '''
+        self.count = 0
+        method()
+        return self.count
+
+
+def createEntities(size, prefix):
+    '''
+        Create a file with size tags over size metatags at most,
+        each tag applied to size files.
+
+        :return: The file, one of its tags and the metatag of the tag
+    '''
+    metatags = [metatagsDao.insert(name="%s metatag %d" % (prefix, i))
+                for i in range(min(size, args.metatags))]
+    tags = [tagsDao.insert(name="%s tag %d" % (prefix, i), metatag=metatags[i % len(metatags)])
+            for i in range(size)]
+    files = [filesDao.insert(name="%s file %d" % (prefix, i), relpath=prefix, mime="video/x-matroska")
+             for i in range(size)]
+    filesDao.addTags(files, tags)
+    # A tag not on the file, to add and remove
+    extra = tagsDao.insert(name="%s extra" % prefix, metatag=metatags[0])
+    return filesDao.getById(files[0].id), tags[0], metatags[0], extra
+
+def getOperations(file, tag, metatag, extra):
+    return [
+        ("files.getById", lambda: filesDao.getById(file.id)),
+        ("files.getByName", lambda: filesDao.getByName(file.name)),
+        ("files.getByPath", lambda: filesDao.getByPath(file.relpath, file.name)),
+        ("files.addTag", lambda: filesDao.addTag(file, extra)),
+        ("files.removeTag", lambda: filesDao.removeTag(file, extra)),
+        ("tags.getById", lambda: tagsDao.getById(tag.id)),
+        ("tags.getByName", lambda: tagsDao.getByName(tag.name)),
+        ("tags.getByFile", lambda: tagsDao.getByFile(file)),
+        ("metatags.getById", lambda: metatagsDao.getById(metatag.id)),
+    ]
+
+small = getOperations(*createEntities(1, "small"))
+large = getOperations(*createEntities(args.tags, "large"))
+counter = QueryCounter()
+print("%-20s %8s %8s" % ("", "1 tag", "%d tags" % args.tags))
+failed = []
+for (label, small_method), (_, large_method) in zip(small, large):
+    small_count = counter.measure(small_method)
+    large_count = counter.measure(large_method)
+    print("%-20s %8d %8d" % (label, small_count, large_count))
+    if large_count > small_count:
+        failed.append(label)
+if len(failed) > 0:
+    print("The queries grow with the number of tags: %s" % ", ".join(failed))
+    sys.exit(1)
+print("OK")
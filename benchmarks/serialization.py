@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.Config import ConfigManager
+
+# Parse the command line argument
+parser = argparse.ArgumentParser(description="Compare the compiled serializers with marshmallow")
+parser.add_argument('--files', help='number of files, default: 20000', type=int, default=20000)
+parser.add_argument('--tags', help='number of tags, default: 2000', type=int, default=2000)
+parser.add_argument('--tags-per-file', help='tags of each file, default: 5', type=int, default=5)
+parser.add_argument('--repeat', help='runs of each serializer, default: 3', type=int, default=3)
+
+args = parser.parse_args()
+
+ConfigManager.setup(tempfile.mkdtemp(prefix="tag-manager-benchmark-"))
+
+from src.dao.entities.Common import IFile
+from src.dao.entities.Common import IFileLazy
+from src.dao.entities.Common import ITag
+from src.dao.entities.Common import ITagFacet
+from src.dao.entities.Common import IMetatag
+from src.web.Schemas import FileSchema
+from src.web.Schemas import FileLazySchema
+from src.web.Schemas import TagSchema
+from src.web.Schemas import TagFacetSchema
+from src.web.Schemas import MetatagSchema
+from src.web.Serializers import getSerializer
+
+
+def createEntities():
+    '''
+        Create the entities from stand-ins of the persistent rows.
+    '''
+    metatags = [SimpleNamespace(id=i, name="metatag %d" % i, tags=[]) for i in range(20)]
+    tags = []
+    for i in range(args.tags):
+        tag = SimpleNamespace(id=i, name="tag %d" % i, metatag=metatags[i % 20], files=[])
+        metatags[i % 20].tags.append(tag)
+        tags.append(tag)
+    files = []
+    for i in range(args.files):
+        file = SimpleNamespace(id=i, name="file %d.mkv" % i, relpath="folder/%d" % (i // 100),
+                               mime="video/x-matroska", tags=[])
+        for j in range(args.tags_per_file):
+            tag = tags[(i * 7 + j * 13) % args.tags]
+            file.tags.append(tag)
+            tag.files.append(file)
+        files.append(file)
+    return {
+        "files (lazy)": (list(map(IFileLazy, files)), FileLazySchema(many=True)),
+        "files (full)": (list(map(IFile, files)), FileSchema(many=True)),
+        "tags (facets)": (list(map(lambda tag: ITagFacet(tag, len(tag.files)), tags)),
+                          TagFacetSchema(many=True)),
+        "tag (full)": (ITag(tags[0]), TagSchema()),
+        "metatag (full)": (IMetatag(metatags[0]), MetatagSchema()),
+    }
+
+def measure(dump, data):
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        dump(data)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+for label, (data, schema) in createEntities().items():
+    serializer = getSerializer(schema)
+    expected = json.dumps(schema.dump(data))
+    if json.dumps(serializer.dump(data)) != expected:
+        print("%-15s output differs from marshmallow" % label)
+        continue
+    marshmallow_time = measure(schema.dump, data)
+    compiled_time = measure(serializer.dump, data)
+    print("%-15s marshmallow: %8.2f ms  compiled: %8.2f ms  (%.1fx)" %
+          (label, marshmallow_time * 1000, compiled_time * 1000, marshmallow_time / compiled_time))
@@ -27,11 +27,9 @@ if path is not None and not os.path.isfile(path):
 ConfigManager.setup(profile_folder)
 
 # Load the thumbnailer
-from src.Thumbnailer import Thumbnailer
+from src.System import thumbnailScheduler
 from src.dao import filesDao
 
-thumbnailer = Thumbnailer(256)
-
 files = filesDao.getByName(file_name)
 print("Got %d files" % len(files))
 if len(files) == 0:
@@ -39,7 +37,8 @@ if len(files) == 0:
 tfile = files[0]
 print("Creating thumbnail for %s" % tfile.name)
 if path is not None:
-    thumb = thumbnailer.createThumbnailFrom(tfile, path)
+    future = thumbnailScheduler.schedule(tfile, path=path)
 else:
-    thumb = thumbnailer.recreateThumbnail(tfile)
+    future = thumbnailScheduler.schedule(tfile, recreate=True)
+thumb = future.result()
 print(thumb)
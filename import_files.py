@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+
+from src.Config import ConfigManager
+
+# Parse the command line argument
+parser = argparse.ArgumentParser(description="Add all the files of a folder to the database")
+parser.add_argument('folder', help='folder to import')
+parser.add_argument('--profile', help='profile name', default='default')
+parser.add_argument('--tag', help='tag applied to all the files, can be repeated', action='append', default=[])
+parser.add_argument('--rules', help='JSON file with the tags to apply by path pattern', default=None)
+parser.add_argument('--metatag', help='metatag of the missing tags to create, default: fail on missing tags', default=None)
+parser.add_argument('--entries', action='store_true', help='import the files and folders directly contained in the folder')
+parser.add_argument('--workers', help='mime detection processes, default: number of cpus', type=int, default=None)
+parser.add_argument('--batch', help='files inserted in a transaction, default: 1000', type=int, default=1000)
+parser.add_argument('--no-thumbnails', action='store_true', help='do not create the thumbnails')
+
+args = parser.parse_args()
+
+if not os.path.isdir(args.folder):
+    print("Missing folder %s" % args.folder)
+    sys.exit(1)
+
+# Configure the application
+profile_folder = os.path.join(os.environ['HOME'], ".config/tag-manager/" + args.profile)
+ConfigManager.setup(profile_folder)
+
+from src.Importer import BulkImporter
+from src.Importer import FolderNotInRoot
+from src.Importer import TagNotFound
+from src.Importer import TagRules
+
+if args.rules is not None:
+    rules = TagRules.load(args.rules, tags=args.tag)
+else:
+    rules = TagRules(tags=args.tag)
+
+importer = BulkImporter(rules=rules, metatag=args.metatag, workers=args.workers, batch_size=args.batch,
+                        entries=args.entries, thumbnails=not args.no_thumbnails)
+try:
+    stats = importer.run(args.folder, report=print)
+except TagNotFound as e:
+    print("Missing tag %s, use --metatag to create it" % e)
+    sys.exit(1)
+except FolderNotInRoot as e:
+    print("The folder %s is not in the root folder %s" % (e, ConfigManager.getRoot()))
+    sys.exit(1)
+print("Done: %s" % stats)
+if stats.thumbnails > 0:
+    print("Waiting for the thumbnails")
+importer.shutdown()
+if stats.thumbnails < stats.inserted and not args.no_thumbnails:
+    print("Create the other thumbnails with ./backfill_thumbs.py --profile %s" % args.profile)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+
+from src.Config import ConfigManager
+
+# Parse the command line argument
+parser = argparse.ArgumentParser(description="Synchronise the database with the files in the root folder")
+parser.add_argument('--profile', help='profile name', default='default')
+parser.add_argument('--batch', help='folders compared with the database at a time, default: 200', type=int, default=200)
+parser.add_argument('--full', action='store_true', help='list the folders unchanged since the last scan too')
+parser.add_argument('--list-missing', action='store_true', help='print the files not found by the scans')
+parser.add_argument('--remove-missing', action='store_true', help='remove the files not found from the database')
+
+args = parser.parse_args()
+
+# Configure the application
+profile_folder = os.path.join(os.environ['HOME'], ".config/tag-manager/" + args.profile)
+ConfigManager.setup(profile_folder)
+
+from src.Scanner import LibraryScanner
+from src.Scanner import joinRelpath
+
+scanner = LibraryScanner(batch_size=args.batch)
+stats = scanner.run(full=args.full, report=print)
+print("Done: %s" % stats)
+
+missing = scanner.getMissing()
+if args.list_missing:
+    for file_id, relpath, name, since in missing:
+        print("#%d %s (missing since %s)" % (file_id, joinRelpath(relpath, name),
+                                             time.strftime("%Y-%m-%d %H:%M", time.localtime(since))))
+if args.remove_missing and len(missing) > 0:
+    from src.dao import filesDao
+    from src.Thumbnailer import Thumbnailer
+    thumbnailer = Thumbnailer(256)
+    for file_id, relpath, name, _ in missing:
+        file = filesDao.getById(file_id)
+        if file is not None:
+            filesDao.delete(file)
+            thumbnailer.removeThumbnail(file)
+        scanner.forget(file_id)
+    print("Removed %d missing files" % len(missing))
+elif len(missing) > 0:
+    print("%d files missing, use --list-missing to show them" % len(missing))
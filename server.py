@@ -9,6 +9,9 @@ from src.Config import ConfigManager
 parser = argparse.ArgumentParser(description="Tag Manager server")
 parser.add_argument('profile_name', help='profile name')
 parser.add_argument('--debug', action='store_true', help='debug')
+parser.add_argument('--production', action='store_true', help='serve with worker processes')
+parser.add_argument('--workers', help='number of worker processes in production mode', type=int, default=None)
+parser.add_argument('--watch', action='store_true', help='keep the database in sync with the root folder')
 
 args = parser.parse_args()
 
@@ -17,35 +20,35 @@ profile_folder = os.path.join(os.environ['HOME'], ".config/tag-manager/" + args.
 ConfigManager.setup(profile_folder)
 ConfigManager.debug = args.debug
 
-from flask import Flask
-from flask_restful import Api
-
-from src.web.resources import Files
-from src.web.resources import Tags
-from src.web.resources import Metatags
-from src.web.resources import FileTags
-from src.web.resources import FileList
-
-from src.Application import API_VERSION
+from src.web.App import createApp
+from src.web.Server import MODE_PRODUCTION
+from src.web.Server import runDevelopment
+from src.web.Server import runProduction
 
+HOST = '0.0.0.0'
 PORT = ConfigManager.SERVER.getPort()
-API_PREFIX = '/api/' + API_VERSION
-
-app = Flask(__name__)
-api = Api(app)
-
-api.add_resource(Files,
-                 API_PREFIX + '/files',
-                 API_PREFIX + '/files/<int:eid>')
-api.add_resource(Tags,
-                 API_PREFIX + '/tags',
-                 API_PREFIX + '/tags/<int:eid>')
-api.add_resource(Metatags,
-                 API_PREFIX + '/metatags',
-                 API_PREFIX + '/metatags/<int:eid>')
-api.add_resource(FileTags,
-                 API_PREFIX + '/files/<int:fid>/tags',
-                 API_PREFIX + '/files/<int:fid>/tags/<int:tid>',)
-api.add_resource(FileList,
-                 API_PREFIX + '/files/<int:fid>/list',)
-app.run(host='0.0.0.0', port=PORT, debug=ConfigManager.debug)
+
+app = createApp()
+
+# With the debug reloader the server runs in a child process, watch from the parent only
+if (args.watch or ConfigManager.SERVER.getWatch()) and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+    from src import Watcher
+    if Watcher.isAvailable():
+        Watcher.startWatcher()
+    else:
+        print("inotify not available, the root folder is not watched")
+
+mode = ConfigManager.SERVER.getMode()
+if args.production:
+    mode = MODE_PRODUCTION
+
+if mode == MODE_PRODUCTION:
+    workers = args.workers
+    if workers is None:
+        workers = ConfigManager.SERVER.getWorkers()
+    runProduction(app, HOST, PORT, workers,
+                  threads=ConfigManager.SERVER.getThreads(),
+                  keep_alive=ConfigManager.SERVER.getKeepAlive(),
+                  graceful_timeout=ConfigManager.SERVER.getGracefulTimeout())
+else:
+    runDevelopment(app, HOST, PORT, debug=ConfigManager.debug)
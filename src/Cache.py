@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    '''
+        Thread-safe least recently used cache with a size budget.
+
+        The size of each value is computed with sizeof (1 per value
+        by default): when the total exceeds max_size the least
+        recently used values are evicted.
+        With a ttl the values expire the given number of seconds
+        after they are added.
+    '''
+
+    def __init__(self, max_size, sizeof=None, ttl=None):
+        '''
+            Initialize.
+
+            :param int max_size: Maximum total size of the values
+            :param callable sizeof: Function returning the size of a value
+            :param float ttl: Seconds a value is kept, forever if None
+        '''
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        '''
+            Get a value and mark it as recently used.
+
+            :param key: Key
+            :param default: Returned if the key is not in the cache
+            :return: The cached value or default
+        '''
+        with self._lock:
+            item = self._values.get(key)
+            if item is not None and item[2] is not None and item[2] <= time.monotonic():
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self._values.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        '''
+            Add a value, evicting the least recently used ones if necessary.
+            A value bigger than the whole budget is not cached.
+
+            :param key: Key
+            :param value: Value
+        '''
+        size = 1 if self.sizeof is None else self.sizeof(value)
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._remove(key)
+            if size > self.max_size:
+                return
+            self._values[key] = (value, size, expires)
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, evicted_size, _) = self._values.popitem(last=False)
+                self.size -= evicted_size
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def removeIf(self, predicate):
+        '''
+            Remove the values whose key matches the predicate.
+
+            :param callable predicate: Function of the key
+        '''
+        with self._lock:
+            for key in list(filter(predicate, self._values)):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        item = self._values.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._values.get(key)
+            return item is not None and (item[2] is None or item[2] > time.monotonic())
+
+    def __len__(self):
+        return len(self._values)
@@ -5,6 +5,8 @@ from .Utils import json
 
 CONFIG_UI = "ui"
 CONFIG_SERVER = "server"
+CONFIG_DB = "db"
+CONFIG_THUMBNAILS = "thumbnails"
 
 class ConfigSetting:
 
@@ -50,6 +52,8 @@ UI_MOVER_TARGET_NAME = ConfigSetting("mover-target-name", "Pattern of the target
 UI_MOVER_CUSTOM_PATTERN_KEYS = ConfigSetting("mover-custom-keys", "List of custom keys used in the target pattern")
 UI_MOVER_OPEN_ON_TAG = ConfigSetting("mover-open-on-tag", "Open the file after moving", False)
 UI_TAGGER_AUTCOMPLETE_METATAGS = ConfigSetting("tagger-allowed-cetegories", "List of categories used in the autocomplete")
+UI_THUMBNAIL_CACHE_SIZE = ConfigSetting("thumbnail-cache-size", "Memory used by the browser to cache the thumbnails, in MiB", 128)
+UI_ICON_CACHE_SIZE = ConfigSetting("icon-cache-size", "Memory used by the browser to cache the mime icons, in MiB", 16)
 
 class UISettings(ChildConfig):
     symbol = CONFIG_UI
@@ -93,8 +97,23 @@ class UISettings(ChildConfig):
     def getTaggerAutocompleteMetatags(self):
         return self.getConfig(UI_TAGGER_AUTCOMPLETE_METATAGS)
 
+    def getThumbnailCacheSize(self):
+        return self.getConfig(UI_THUMBNAIL_CACHE_SIZE)
+
+    def getIconCacheSize(self):
+        return self.getConfig(UI_ICON_CACHE_SIZE)
+
 
 SERVER_PORT = ConfigSetting("port", "Port the API server listens on", 44659)
+SERVER_MODE = ConfigSetting("mode", "Server used to serve the API (development, production)", "development")
+SERVER_WORKERS = ConfigSetting("workers", "Number of worker processes in production mode", 4)
+SERVER_THREADS = ConfigSetting("threads", "Number of threads of each worker process in production mode", 4)
+SERVER_KEEP_ALIVE = ConfigSetting("keep-alive", "Seconds an idle connection is kept open in production mode", 5)
+SERVER_GRACEFUL_TIMEOUT = ConfigSetting("graceful-timeout", "Seconds the workers have to complete the running requests on shutdown", 30)
+SERVER_STREAM = ConfigSetting("stream", "Stream the lists of files, tags and metatags as they are read from the database", False)
+SERVER_WATCH = ConfigSetting("watch", "Keep the database in sync with the root folder with inotify (Linux only)", False)
+SERVER_RESPONSE_CACHE_SIZE = ConfigSetting("response-cache-size", "Number of lists of files and tags kept in memory by each worker, 0 to disable", 256)
+SERVER_RESPONSE_CACHE_TTL = ConfigSetting("response-cache-ttl", "Seconds a cached list of files or tags is kept", 300)
 
 class ServerSettings(ChildConfig):
     symbol = CONFIG_SERVER
@@ -105,6 +124,93 @@ class ServerSettings(ChildConfig):
     def setPort(self, port):
         self.setConfig(SERVER_PORT, port)
 
+    def getStream(self):
+        return self.getConfig(SERVER_STREAM)
+
+    def getMode(self):
+        return self.getConfig(SERVER_MODE)
+
+    def getWorkers(self):
+        return self.getConfig(SERVER_WORKERS)
+
+    def getThreads(self):
+        return self.getConfig(SERVER_THREADS)
+
+    def getKeepAlive(self):
+        return self.getConfig(SERVER_KEEP_ALIVE)
+
+    def getGracefulTimeout(self):
+        return self.getConfig(SERVER_GRACEFUL_TIMEOUT)
+
+    def getWatch(self):
+        return self.getConfig(SERVER_WATCH)
+
+    def getResponseCacheSize(self):
+        return self.getConfig(SERVER_RESPONSE_CACHE_SIZE)
+
+    def getResponseCacheTTL(self):
+        return self.getConfig(SERVER_RESPONSE_CACHE_TTL)
+
+DB_TAG_INDEX = ConfigSetting("tag-index", "Keep an in-memory index of the tagged files to speed up the searches by tag", False)
+DB_SEARCH_INDEX = ConfigSetting("search-index", "Index the names of files and tags for the searches by part of the name (requires SQLite FTS5)", True)
+DB_JOURNAL_MODE = ConfigSetting("journal-mode", "SQLite journal mode (delete, truncate, persist, memory, wal, off)", "wal")
+DB_SYNCHRONOUS = ConfigSetting("synchronous", "SQLite synchronous level (off, normal, full, extra)", "normal")
+DB_CACHE_SIZE = ConfigSetting("cache-size", "SQLite page cache size per connection, in pages if positive, in KiB if negative", -65536)
+DB_MMAP_SIZE = ConfigSetting("mmap-size", "Maximum number of bytes of the database file mapped in memory", 268435456)
+DB_TEMP_STORE = ConfigSetting("temp-store", "Where SQLite keeps temporary tables and indices (default, file, memory)", "memory")
+
+class DBSettings(ChildConfig):
+    symbol = CONFIG_DB
+
+    def getTagIndex(self):
+        return self.getConfig(DB_TAG_INDEX)
+
+    def getSearchIndex(self):
+        return self.getConfig(DB_SEARCH_INDEX)
+
+    def getPragmas(self):
+        '''
+            Get the SQLite pragmas to apply on every connection.
+            Settings set to null are not applied.
+
+            :return: List of pragma names and values
+            :rtype: list of tuple
+        '''
+        pragmas = [("journal_mode", self.getConfig(DB_JOURNAL_MODE)),
+                   ("synchronous", self.getConfig(DB_SYNCHRONOUS)),
+                   ("cache_size", self.getConfig(DB_CACHE_SIZE)),
+                   ("mmap_size", self.getConfig(DB_MMAP_SIZE)),
+                   ("temp_store", self.getConfig(DB_TEMP_STORE))]
+        return list(filter(lambda pragma: pragma[1] is not None, pragmas))
+
+THUMBNAILS_WORKERS = ConfigSetting("workers", "Maximum number of thumbnails created at the same time", 2)
+THUMBNAILS_QUEUE_SIZE = ConfigSetting("queue-size", "Maximum number of thumbnails waiting to be created", 256)
+THUMBNAILS_RETRY_DELAY = ConfigSetting("retry-delay", "Seconds before retrying a failed thumbnail, doubled at each failure", 3600)
+THUMBNAILS_MAX_RETRIES = ConfigSetting("max-retries", "Failures after which a thumbnail is not retried until the file changes", 5)
+THUMBNAILS_TIMEOUT = ConfigSetting("timeout", "Seconds after which a thumbnailer process is killed, 0 to wait forever", 60)
+THUMBNAILS_FOLDER_COVERS = ConfigSetting("folder-covers", "Names, without extension, of the files preferred for the thumbnail of a folder", ["cover", "folder"])
+
+class ThumbnailsSettings(ChildConfig):
+    symbol = CONFIG_THUMBNAILS
+
+    def getWorkers(self):
+        return self.getConfig(THUMBNAILS_WORKERS)
+
+    def getQueueSize(self):
+        return self.getConfig(THUMBNAILS_QUEUE_SIZE)
+
+    def getTimeout(self):
+        return self.getConfig(THUMBNAILS_TIMEOUT)
+
+    def getFolderCovers(self):
+        return self.getConfig(THUMBNAILS_FOLDER_COVERS)
+
+    def getRetryDelay(self):
+        return self.getConfig(THUMBNAILS_RETRY_DELAY)
+
+    def getMaxRetries(self):
+        return self.getConfig(THUMBNAILS_MAX_RETRIES)
+
 MAIN_ROOT = 'root'
 
 class _ConfigManager:
@@ -118,6 +224,8 @@ class _ConfigManager:
     def loadChildConfigs(self):
         self.UI = UISettings(self)
         self.SERVER = ServerSettings(self)
+        self.DB = DBSettings(self)
+        self.THUMBNAILS = ThumbnailsSettings(self)
 
     def setup(self, profile_folder):
         # Create profile folder
@@ -151,6 +259,12 @@ class _ConfigManager:
         if not CONFIG_SERVER in self.settings:
             self.settings[CONFIG_SERVER] = {}
             edited = True
+        if not CONFIG_DB in self.settings:
+            self.settings[CONFIG_DB] = {}
+            edited = True
+        if not CONFIG_THUMBNAILS in self.settings:
+            self.settings[CONFIG_THUMBNAILS] = {}
+            edited = True
         # Save
         if edited:
             self.save()
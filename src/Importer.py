@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import fnmatch
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.Config import ConfigManager
+from src.Logging import createLogger
+from src.System import getRootRelativePath
+from src.System import thumbnailScheduler
+from src.Utils import guessMime
+from src.Utils import json
+from src.dao import filesDao
+from src.dao import metatagsDao
+from src.dao import tagsDao
+from src.dao import unitOfWork
+
+BATCH_SIZE = 1000
+
+# Paths sent to a mime detection process at a time
+MIME_CHUNK_SIZE = 64
+
+
+class TagNotFound(Exception):
+    pass
+
+class FolderNotInRoot(Exception):
+    pass
+
+
+class ImportStats:
+
+    def __init__(self):
+        self.start = time.time()
+        self.found = 0
+        self.processed = 0
+        self.inserted = 0
+        self.existing = 0
+        self.tagged = 0
+        self.failed = 0
+        self.thumbnails = 0
+
+    def getRate(self):
+        '''
+            Get the number of files processed per second.
+
+            :rtype: float
+        '''
+        elapsed = time.time() - self.start
+        if elapsed == 0:
+            return 0.0
+        return self.processed / elapsed
+
+    def __str__(self):
+        return "%d/%d files (%d inserted, %d existing, %d tagged, %d failed, %d thumbnails queued) " \
+               "in %.1fs, %.1f files/s" % \
+            (self.processed, self.found, self.inserted, self.existing, self.tagged, self.failed,
+             self.thumbnails, time.time() - self.start, self.getRate())
+
+
+class TagRules:
+    '''
+        Tags to apply to the imported files.
+
+        The rules file is a JSON list of rules, each one with a pattern
+        matched (fnmatch) against the path of the file relative to the
+        imported folder and the names of the tags to apply:
+        [{"pattern": "*.mkv", "tags": ["Video"]}, {"pattern": "photos/*", "tags": ["Photo"]}]
+    '''
+
+    def __init__(self, tags=None, rules=None):
+        '''
+            Initialize.
+
+            :param list of str tags: Tags applied to all the files
+            :param list of dict rules: Rules with pattern and tags
+        '''
+        self.tags = list(tags or [])
+        self.rules = list(rules or [])
+
+    @classmethod
+    def load(cls, path, tags=None):
+        '''
+            Load the rules from a JSON file.
+
+            :param str path: Path of the rules file
+            :param list of str tags: Tags applied to all the files
+            :rtype: TagRules
+        '''
+        with open(path) as hand:
+            return cls(tags, json.load(hand))
+
+    def getNames(self):
+        '''
+            Get the names of all the tags used by the rules.
+
+            :rtype: set of str
+        '''
+        names = set(self.tags)
+        for rule in self.rules:
+            names.update(rule['tags'])
+        return names
+
+    def match(self, path):
+        '''
+            Get the tags to apply to a file.
+
+            :param str path: Path relative to the imported folder
+            :return: Names of the tags
+            :rtype: frozenset of str
+        '''
+        names = set(self.tags)
+        for rule in self.rules:
+            if fnmatch.fnmatch(path, rule['pattern']):
+                names.update(rule['tags'])
+        return frozenset(names)
+
+
+def _detectMime(path):
+    '''
+        Get the mime of a file, in a mime detection process.
+
+        :return: Mime, None in case of errors
+        :rtype: str
+    '''
+    try:
+        return guessMime(path)
+    except Exception:
+        return None
+
+
+class BulkImporter:
+    '''
+        Add a whole folder to the database.
+
+        The folder is walked with os.scandir (hidden files and folders are
+        skipped), the mimes are detected in a pool of processes and the
+        files are inserted in batches, each one in a single transaction
+        with its tags. The thumbnails are queued without waiting for them:
+        the ones not queued because the queue was full are created by
+        backfill_thumbs.py.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self, rules=None, metatag=None, workers=None, batch_size=BATCH_SIZE,
+                 entries=False, thumbnails=True):
+        '''
+            Initialize.
+
+            :param TagRules rules: Tags to apply
+            :param str metatag: Metatag of the tags to create, None to require existing tags
+            :param int workers: Mime detection processes, default: number of cpus
+            :param int batch_size: Files inserted in a transaction
+            :param bool entries: True to import the files and folders directly
+                                 contained in the folder instead of the whole tree
+            :param bool thumbnails: False to skip the thumbnails
+        '''
+        self.rules = rules if rules is not None else TagRules()
+        self.metatag = metatag
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.entries = entries
+        self.thumbnails = thumbnails
+        self._tags = {}
+
+    def run(self, folder, report=None):
+        '''
+            Import a folder.
+
+            :param str folder: Folder to import
+            :param callable report: Called with the stats after each batch
+            :return: Stats of the import
+            :rtype: ImportStats
+            :raises FolderNotInRoot: If the folder is not in the root folder
+        '''
+        folder = os.path.abspath(folder)
+        relpath = os.path.relpath(folder, ConfigManager.getRoot())
+        if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+            raise FolderNotInRoot(folder)
+        stats = ImportStats()
+        self._tags = self._loadTags(self.rules.getNames())
+        paths = list(self._walk(folder))
+        stats.found = len(paths)
+        batch = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            mimes = executor.map(_detectMime, paths, chunksize=MIME_CHUNK_SIZE)
+            for path, mime in zip(paths, mimes):
+                if mime is None:
+                    self.log.warning("Cannot read %s" % path)
+                    stats.failed += 1
+                    stats.processed += 1
+                    continue
+                batch.append((path, mime))
+                if len(batch) == self.batch_size:
+                    self._importBatch(folder, batch, stats)
+                    batch = []
+                    if report is not None:
+                        report(stats)
+        if len(batch) > 0:
+            self._importBatch(folder, batch, stats)
+            if report is not None:
+                report(stats)
+        self.log.info("Import completed: %s" % stats)
+        return stats
+
+    def _loadTags(self, names):
+        '''
+            Get the tags used by the rules, creating the missing ones
+            if a metatag is configured.
+
+            :param set of str names: Tag names
+            :return: Tags by name
+            :rtype: dict
+        '''
+        tags = {}
+        metatag = None
+        for name in sorted(names):
+            tag = tagsDao.getByName(name)
+            if tag is None:
+                if self.metatag is None:
+                    raise TagNotFound(name)
+                if metatag is None:
+                    metatag = metatagsDao.getByName(self.metatag)
+                    if metatag is None:
+                        metatag = metatagsDao.insert(name=self.metatag)
+                tag = tagsDao.insert(name=name, metatag=metatag)
+            tags[name] = tag
+        return tags
+
+    def _walk(self, folder):
+        '''
+            Get the paths to import.
+
+            :param str folder: Folder
+            :return: Paths
+            :rtype: generator of str
+        '''
+        stack = [folder]
+        while len(stack) > 0:
+            path = stack.pop()
+            try:
+                with os.scandir(path) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError as e:
+                self.log.warning("Cannot list %s: %s" % (path, e))
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False) and not self.entries:
+                    stack.append(entry.path)
+                else:
+                    yield entry.path
+
+    def _importBatch(self, folder, batch, stats):
+        '''
+            Insert and tag a batch of files in a single transaction.
+
+            :param str folder: Imported folder
+            :param list of tuple batch: Path and mime of each file
+            :param ImportStats stats: Stats to update
+        '''
+        values = []
+        names = {}
+        for path, mime in batch:
+            relpath, name = getRootRelativePath(path)
+            values.append({'relpath': relpath, 'name': name, 'mime': mime})
+            names[(relpath, name)] = self.rules.match(os.path.relpath(path, folder))
+        with unitOfWork():
+            inserted = filesDao.insertMany(values)
+            files = filesDao.getByPaths(list(names))
+            # Add each set of tags to its files with a single insert
+            tag_sets = {}
+            for file in files:
+                tag_names = names[(file.relpath, file.name)]
+                if len(tag_names) > 0:
+                    tag_sets.setdefault(tag_names, []).append(file.id)
+            for tag_names, file_ids in tag_sets.items():
+                filesDao.addTags(file_ids, list(map(lambda tag_name: self._tags[tag_name].id, tag_names)))
+                stats.tagged += len(file_ids)
+        stats.inserted += len(inserted)
+        stats.existing += len(batch) - len(inserted)
+        stats.processed += len(batch)
+        if self.thumbnails:
+            inserted_ids = set(map(lambda row: row[0], inserted))
+            for file in files:
+                if file.id in inserted_ids and thumbnailScheduler.schedule(file, block=False) is not None:
+                    stats.thumbnails += 1
+
+    def shutdown(self):
+        '''
+            Wait for the queued thumbnails.
+        '''
+        thumbnailScheduler.shutdown(wait=True)
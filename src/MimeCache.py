@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+from threading import Lock
+
+from src.Cache import LRUCache
+
+CACHE_NAME = "mimes.db"
+
+# Mimes kept in memory
+MEMORY_SIZE = 20000
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS Mimes (
+        dev INTEGER NOT NULL,
+        ino INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        mime TEXT NOT NULL,
+        PRIMARY KEY (dev, ino)
+    )
+'''
+
+
+def _getKey(stat):
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class MimeCache:
+    '''
+        Cache of the mimes detected with libmagic, by device, inode,
+        size and mtime of the file, so a changed file is read again.
+
+        The mimes are kept in memory and in a SQLite file in the profile
+        folder. The file is opened on first use since this module is
+        imported before the profile is configured; without a profile
+        only the memory is used.
+        A forked process starts with an empty cache and its own connection.
+    '''
+
+    def __init__(self, memory_size=MEMORY_SIZE):
+        self.memory_size = memory_size
+        self._reset()
+
+    def _reset(self):
+        self.memory = LRUCache(self.memory_size)
+        self._connection = None
+        self._opened = False
+        self._lock = Lock()
+
+    def _getConnection(self):
+        if not self._opened:
+            self._opened = True
+            from src.Config import ConfigManager
+            if ConfigManager.profile_folder is not None:
+                path = os.path.join(ConfigManager.profile_folder, CACHE_NAME)
+                connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.execute("PRAGMA synchronous = NORMAL")
+                connection.execute(SCHEMA)
+                connection.commit()
+                self._connection = connection
+        return self._connection
+
+    def get(self, stat):
+        '''
+            Get the mime of a file.
+
+            :param os.stat_result stat: Stat of the file
+            :return: Mime, None if not cached
+            :rtype: str
+        '''
+        key = _getKey(stat)
+        mime = self.memory.get(key)
+        if mime is not None:
+            return mime
+        with self._lock:
+            connection = self._getConnection()
+            if connection is None:
+                return None
+            row = connection.execute(
+                "SELECT size, mtime_ns, mime FROM Mimes WHERE dev = ? AND ino = ?",
+                (stat.st_dev, stat.st_ino)).fetchone()
+        if row is None or (row[0], row[1]) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        self.memory.put(key, row[2])
+        return row[2]
+
+    def put(self, stat, mime):
+        '''
+            Cache the mime of a file.
+
+            :param os.stat_result stat: Stat of the file
+            :param str mime: Mime
+        '''
+        self.memory.put(_getKey(stat), mime)
+        with self._lock:
+            connection = self._getConnection()
+            if connection is None:
+                return
+            connection.execute(
+                "INSERT OR REPLACE INTO Mimes (dev, ino, size, mtime_ns, mime) VALUES (?, ?, ?, ?, ?)",
+                (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns, mime))
+            connection.commit()
+
+
+mimeCache = MimeCache()
+os.register_at_fork(after_in_child=mimeCache._reset)
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+import time
+
+from src.Config import ConfigManager
+from src.Logging import createLogger
+from src.Utils import json
+from src.Utils import guessMime
+from src.dao import filesDao
+from src.dao import unitOfWork
+
+BATCH_SIZE = 200
+
+SNAPSHOT_NAME = "library.db"
+
+ROOT_RELPATH = "."
+
+MIME_DIRECTORY = "inode/directory"
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS Directories (
+        relpath TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        subdirs TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Inodes (
+        file_id INTEGER PRIMARY KEY,
+        dev INTEGER NOT NULL,
+        ino INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        is_dir INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS InodesByIno ON Inodes (ino, dev)
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Missing (
+        file_id INTEGER PRIMARY KEY,
+        relpath TEXT NOT NULL,
+        name TEXT NOT NULL,
+        since REAL NOT NULL
+    )
+    ''',
+]
+
+
+def joinRelpath(relpath, name):
+    '''
+        Get the path, relative to the root, of an entry of a folder.
+        The files in the root have relpath "." like in System.getRootRelativePath.
+
+        :param str relpath: Path of the folder relative to the root
+        :param str name: Name of the entry
+        :rtype: str
+    '''
+    if relpath == ROOT_RELPATH:
+        return name
+    return os.path.join(relpath, name)
+
+
+class DirectoryEntry:
+
+    def __init__(self, entry, dev):
+        self.name = entry.name
+        self.is_dir = entry.is_dir(follow_symlinks=False)
+        self.dev = dev
+        self.ino = entry.inode()
+        self._entry = entry
+        self._mtime_ns = None
+
+    def getMtime(self):
+        if self._mtime_ns is None:
+            self._mtime_ns = self._entry.stat(follow_symlinks=False).st_mtime_ns
+        return self._mtime_ns
+
+
+class ScannedDirectory:
+
+    def __init__(self, relpath, mtime_ns, entries, previous_subdirs):
+        self.relpath = relpath
+        self.mtime_ns = mtime_ns
+        self.entries = entries
+        self.previous_subdirs = previous_subdirs
+        self.subdirs = []
+
+
+class ScanStats:
+
+    def __init__(self):
+        self.start = time.time()
+        self.directories = 0
+        self.unchanged = 0
+        self.inserted = 0
+        self.moved = 0
+        self.missing = 0
+        self.found = 0
+
+    def __str__(self):
+        return "%d directories (%d unchanged), %d files inserted, %d moved, " \
+               "%d missing, %d found again in %.1fs" % \
+            (self.directories, self.unchanged, self.inserted, self.moved,
+             self.missing, self.found, time.time() - self.start)
+
+
+class LibrarySnapshot:
+    '''
+        State of the library folder at the last scan, stored in a SQLite
+        file in the profile folder:
+        the mtime and the subfolders of each folder, the inode of each
+        file in the database and the files not found by the scans.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+
+    def _getConnection(self):
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode = WAL")
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def getDirectories(self):
+        '''
+            Get the mtime and the subfolders of all the folders.
+
+            :return: Mtime and subfolder names by relpath
+            :rtype: dict
+        '''
+        rows = self._getConnection().execute("SELECT relpath, mtime_ns, subdirs FROM Directories")
+        return dict(map(lambda row: (row[0], (row[1], json.loads(row[2]))), rows))
+
+    def setDirectory(self, relpath, mtime_ns, subdirs):
+        self._getConnection().execute(
+            "INSERT OR REPLACE INTO Directories (relpath, mtime_ns, subdirs) VALUES (?, ?, ?)",
+            (relpath, mtime_ns, json.dumps(subdirs)))
+
+    def removeDirectoryTree(self, relpath):
+        pattern = relpath.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '/%'
+        self._getConnection().execute(
+            "DELETE FROM Directories WHERE relpath = ? OR relpath LIKE ? ESCAPE '\\'",
+            (relpath, pattern))
+
+    def getFileByInode(self, entry):
+        '''
+            Get the file that had the inode of the given entry.
+            A file must also have the same mtime, a folder changes mtime
+            with its content.
+
+            :param DirectoryEntry entry: Entry
+            :return: File id, None if not found
+            :rtype: int
+        '''
+        rows = self._getConnection().execute(
+            "SELECT file_id, mtime_ns, is_dir FROM Inodes WHERE ino = ? AND dev = ?",
+            (entry.ino, entry.dev))
+        for file_id, mtime_ns, is_dir in rows:
+            if bool(is_dir) != entry.is_dir:
+                continue
+            if entry.is_dir or mtime_ns == entry.getMtime():
+                return file_id
+        return None
+
+    def setInode(self, file_id, entry):
+        self._getConnection().execute(
+            "INSERT OR REPLACE INTO Inodes (file_id, dev, ino, mtime_ns, is_dir) VALUES (?, ?, ?, ?, ?)",
+            (file_id, entry.dev, entry.ino, entry.getMtime(), entry.is_dir))
+
+    def setMissing(self, file):
+        '''
+            Flag a file not found.
+
+            :param IFileLazy file: File
+            :return: False if the file was already flagged
+            :rtype: bool
+        '''
+        cursor = self._getConnection().execute(
+            "INSERT OR IGNORE INTO Missing (file_id, relpath, name, since) VALUES (?, ?, ?, ?)",
+            (file.id, file.relpath, file.name, time.time()))
+        return cursor.rowcount > 0
+
+    def setFound(self, file_id):
+        '''
+            Remove the flag of a file found again.
+
+            :param int file_id: File id
+            :return: True if the file was flagged
+            :rtype: bool
+        '''
+        cursor = self._getConnection().execute("DELETE FROM Missing WHERE file_id = ?", (file_id,))
+        return cursor.rowcount > 0
+
+    def getMissing(self):
+        '''
+            Get the files not found by the scans.
+
+            :return: File id, relpath, name and time they were found missing
+            :rtype: list of tuple
+        '''
+        return self._getConnection().execute(
+            "SELECT file_id, relpath, name, since FROM Missing ORDER BY relpath, name").fetchall()
+
+    def removeFile(self, file_id):
+        connection = self._getConnection()
+        connection.execute("DELETE FROM Missing WHERE file_id = ?", (file_id,))
+        connection.execute("DELETE FROM Inodes WHERE file_id = ?", (file_id,))
+
+    def commit(self):
+        self._getConnection().commit()
+
+    def rollback(self):
+        self._getConnection().rollback()
+
+
+class LibraryScanner:
+    '''
+        Synchronise the database with the content of the root folder.
+
+        The folders are listed with os.scandir and compared, in batches,
+        with the files of the database in the same folders: the new files
+        are inserted, the files found with a different path are moved
+        and the files not found are flagged as missing.
+        The folders with the same mtime as in the last scan are not
+        listed again, only their subfolders are checked.
+        Tagged folders are entries of the library and are not scanned,
+        hidden files and folders are ignored.
+        A file is recognised as moved when an entry has the inode (and,
+        for a file, the mtime) it had at the last scan and its old path
+        does not exist anymore.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self, batch_size=BATCH_SIZE, snapshot_path=None, listener=None):
+        '''
+            Initialize.
+
+            :param int batch_size: Number of folders compared with the database at a time
+            :param str snapshot_path: Path of the snapshot database, default: in the profile folder
+            :param callable listener: Called with the ids of the files inserted by each batch
+        '''
+        if snapshot_path is None:
+            snapshot_path = os.path.join(ConfigManager.profile_folder, SNAPSHOT_NAME)
+        self.root = ConfigManager.getRoot()
+        self.batch_size = batch_size
+        self.snapshot = LibrarySnapshot(snapshot_path)
+        self.listener = listener
+        self._moved = set()
+        self._flagged = set()
+
+    def run(self, full=False, report=None, relpaths=None):
+        '''
+            Scan the root folder, or only some folders.
+            When the folders are given their unchanged subfolders are
+            not visited, the new subfolders are scanned.
+
+            :param bool full: True to list the unchanged folders too
+            :param callable report: Called with the stats after each batch
+            :param iterable of str relpaths: Folders to scan, relative to the root
+            :return: Stats of the scan
+            :rtype: ScanStats
+        '''
+        stats = ScanStats()
+        self._moved = set()
+        self._flagged = set()
+        directories = self.snapshot.getDirectories()
+        stack = [ROOT_RELPATH] if relpaths is None else list(relpaths)
+        batch = []
+        while len(stack) > 0 or len(batch) > 0:
+            if len(stack) == 0 or len(batch) >= self.batch_size:
+                # The subfolders to scan are known after the comparison
+                stack.extend(self._processBatch(batch, stats))
+                batch = []
+                if report is not None:
+                    report(stats)
+                continue
+            relpath = stack.pop()
+            stats.directories += 1
+            path = os.path.join(self.root, relpath) if relpath != ROOT_RELPATH else self.root
+            previous = directories.get(relpath)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Removed during the scan, the parent is scanned again the next time
+                continue
+            if not full and previous is not None and previous[0] == stat.st_mtime_ns:
+                stats.unchanged += 1
+                if relpaths is None:
+                    stack.extend(map(lambda name: joinRelpath(relpath, name), previous[1]))
+                continue
+            entries = self._listDirectory(path, stat.st_dev)
+            previous_subdirs = [] if previous is None else previous[1]
+            batch.append(ScannedDirectory(relpath, stat.st_mtime_ns, entries, previous_subdirs))
+        self.log.info("Scan completed: %s" % stats)
+        return stats
+
+    def _listDirectory(self, path, dev):
+        entries = []
+        try:
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    if entry.name.startswith('.'):
+                        continue
+                    entries.append(DirectoryEntry(entry, dev))
+        except OSError as e:
+            self.log.warning("Cannot list %s: %s" % (path, e))
+        return entries
+
+    def _processBatch(self, batch, stats):
+        '''
+            Compare a batch of folders with the database and apply the
+            changes (moves, missing files and new files) in a single
+            transaction.
+
+            :param list of ScannedDirectory batch: Listed folders
+            :param ScanStats stats: Stats to update
+            :return: Relpaths of the subfolders to scan
+            :rtype: list of str
+        '''
+        if len(batch) == 0:
+            return []
+        stored = {}
+        for file in filesDao.getByFolders(list(map(lambda directory: directory.relpath, batch))):
+            stored.setdefault(file.relpath, {})[file.name] = file
+        # Read the mimes of the entries not in the database outside of the
+        # write transaction, the moved files among them are read too but
+        # their mimes are usually cached
+        mimes = {}
+        for directory in batch:
+            names = stored.get(directory.relpath, {})
+            for entry in directory.entries:
+                if entry.is_dir or entry.name in names:
+                    continue
+                path = os.path.join(self.root, joinRelpath(directory.relpath, entry.name))
+                try:
+                    mimes[(directory.relpath, entry.name)] = guessMime(path)
+                except Exception as e:
+                    self.log.warning("Cannot read %s: %s" % (path, e))
+        try:
+            with unitOfWork():
+                new_entries = []
+                for directory in batch:
+                    new_entries.extend(self._compareDirectory(directory, stored.get(directory.relpath, {}), stats))
+                to_insert = {}
+                for relpath, entry in new_entries:
+                    mime = mimes.get((relpath, entry.name))
+                    if mime is not None:
+                        to_insert[(relpath, entry.name)] = (entry, mime)
+                values = list(map(lambda key: {'relpath': key[0], 'name': key[1], 'mime': to_insert[key][1]}, to_insert))
+                inserted = filesDao.insertMany(values)
+        except BaseException:
+            # Keep the snapshot consistent with the database
+            self.snapshot.rollback()
+            raise
+        for file_id, relpath, name in inserted:
+            self.snapshot.setInode(file_id, to_insert[(relpath, name)][0])
+        stats.inserted += len(inserted)
+        subdirs = []
+        for directory in batch:
+            self.snapshot.setDirectory(directory.relpath, directory.mtime_ns, directory.subdirs)
+            subdirs.extend(map(lambda name: joinRelpath(directory.relpath, name), directory.subdirs))
+        self.snapshot.commit()
+        if self.listener is not None and len(inserted) > 0:
+            self.listener(list(map(lambda row: row[0], inserted)))
+        return subdirs
+
+    def _compareDirectory(self, directory, stored, stats):
+        '''
+            Compare the entries of a folder with its files in the database.
+            Moves and missing files are applied in the current unit of work.
+
+            :param ScannedDirectory directory: Listed folder
+            :param dict stored: Files of the database in the folder by name
+            :param ScanStats stats: Stats to update
+            :return: Relpath of the folder and entry of the new files
+            :rtype: list of tuple
+        '''
+        new_entries = []
+        names = set()
+        for entry in directory.entries:
+            names.add(entry.name)
+            file = stored.get(entry.name)
+            if file is None:
+                file = self._findMoved(directory.relpath, entry, stats)
+            if file is not None:
+                self.snapshot.setInode(file.id, entry)
+                if self.snapshot.setFound(file.id):
+                    if file.id in self._flagged:
+                        # Flagged by a folder scanned before the new folder
+                        stats.missing -= 1
+                    else:
+                        stats.found += 1
+            elif entry.is_dir:
+                directory.subdirs.append(entry.name)
+            else:
+                new_entries.append((directory.relpath, entry))
+        for name, file in stored.items():
+            # Skip the files moved by a folder scanned before in the batch
+            if name not in names and file.id not in self._moved:
+                self._flagMissing(file, stats)
+        for name in directory.previous_subdirs:
+            if name not in directory.subdirs:
+                self._removeDirectoryTree(joinRelpath(directory.relpath, name), stats)
+        return new_entries
+
+    def _findMoved(self, relpath, entry, stats):
+        '''
+            Find the file of the database moved to the given entry.
+
+            :param str relpath: Path of the folder of the entry
+            :param DirectoryEntry entry: Entry not in the database
+            :param ScanStats stats: Stats to update
+            :return: The moved file, None if the entry is a new file
+            :rtype: IFileLazy
+        '''
+        file_id = self.snapshot.getFileByInode(entry)
+        if file_id is None:
+            return None
+        file = filesDao.getById(file_id)
+        if file is None:
+            return None
+        if os.path.lexists(os.path.join(self.root, joinRelpath(file.relpath, file.name))):
+            return None
+        self.log.info("Moved %s to %s" % (joinRelpath(file.relpath, file.name), joinRelpath(relpath, entry.name)))
+        file = filesDao.update(file_id, relpath=relpath, name=entry.name)
+        self._moved.add(file_id)
+        stats.moved += 1
+        return file
+
+    def _flagMissing(self, file, stats):
+        if file.mime == MIME_DIRECTORY:
+            self.snapshot.removeDirectoryTree(joinRelpath(file.relpath, file.name))
+        if self.snapshot.setMissing(file):
+            self.log.info("Missing %s" % joinRelpath(file.relpath, file.name))
+            self._flagged.add(file.id)
+            stats.missing += 1
+
+    def _removeDirectoryTree(self, relpath, stats):
+        '''
+            Flag the files of a folder that is not scanned anymore.
+            The files moved somewhere else are found by inode, also when
+            the new folder is scanned later.
+
+            :param str relpath: Path of the folder relative to the root
+            :param ScanStats stats: Stats to update
+        '''
+        self.snapshot.removeDirectoryTree(relpath)
+        for file in filesDao.getInFolderTree(relpath):
+            if not os.path.lexists(os.path.join(self.root, joinRelpath(file.relpath, file.name))):
+                self._flagMissing(file, stats)
+
+    def getDirectories(self):
+        '''
+            Get the folders scanned, the tagged and hidden folders excluded.
+
+            :return: Relpaths of the folders
+            :rtype: set of str
+        '''
+        return set(self.snapshot.getDirectories())
+
+    def getMissing(self):
+        '''
+            Get the files flagged as missing.
+
+            :return: File id, relpath, name and time they were found missing
+            :rtype: list of tuple
+        '''
+        return self.snapshot.getMissing()
+
+    def forget(self, file_id):
+        '''
+            Forget the scan state of a file removed from the database.
+
+            :param int file_id: File id
+        '''
+        self.snapshot.removeFile(file_id)
+        self.snapshot.commit()
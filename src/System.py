@@ -6,9 +6,11 @@ from subprocess import Popen
 from .dao import filesDao
 from .Config import ConfigManager
 from .Thumbnailer import Thumbnailer
+from .ThumbnailScheduler import ThumbnailScheduler
 from src.Utils import guessMime
 
 thumbnailer = Thumbnailer(256)
+thumbnailScheduler = ThumbnailScheduler(thumbnailer)
 
 def openFile(relpath):
     '''
@@ -50,8 +52,8 @@ def addFile(path):
     mime = guessMime(path)
     # Add to db
     file = filesDao.insert(name=name, relpath=relpath, mime=mime)
-    # Create thumbnail
-    thumbnailer.getThumbnail(file)
+    # Create thumbnail in background
+    thumbnailScheduler.schedule(file)
     return file
 
 def removeFile(file):
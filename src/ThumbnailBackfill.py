@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import os
+import time
+
+from src.Logging import createLogger
+from src.Utils import json
+from src.ThumbnailScheduler import ThumbnailScheduler
+from src.dao import filesDao
+
+BATCH_SIZE = 500
+
+CHECKPOINT_NAME = "backfill.json"
+
+
+class BackfillStats:
+
+    def __init__(self):
+        self.start = time.time()
+        self.processed = 0
+        self.created = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def getRate(self):
+        '''
+            Get the number of files processed per second.
+
+            :rtype: float
+        '''
+        elapsed = time.time() - self.start
+        if elapsed == 0:
+            return 0.0
+        return self.processed / elapsed
+
+    def __str__(self):
+        return "%d files (%d created, %d skipped, %d failed) in %.1fs, %.1f files/s" % \
+            (self.processed, self.created, self.skipped, self.failed,
+             time.time() - self.start, self.getRate())
+
+
+class ThumbnailBackfill:
+    '''
+        Create the missing or stale thumbnails of all the files in the library.
+        The thumbnails that failed recently are skipped until their retry delay is over.
+        The files are read in id order in batches and the id of the last
+        completed batch is saved, so an interrupted run resumes from there.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self, thumbnailer, workers=None, batch_size=BATCH_SIZE, force=False):
+        '''
+            Initialize.
+
+            :param Thumbnailer thumbnailer: Thumbnailer
+            :param int workers: Number of thumbnails created in parallel, default: number of cpus
+            :param int batch_size: Number of files read from the database at a time
+            :param bool force: True to recreate the fresh thumbnails too
+        '''
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.thumbnailer = thumbnailer
+        self.scheduler = ThumbnailScheduler(thumbnailer, workers=workers, queue_size=workers * 2)
+        self.batch_size = batch_size
+        self.force = force
+        thumbnails_folder = os.path.join(thumbnailer.thumbnails_folder, str(thumbnailer.icon_size))
+        self.checkpoint_path = os.path.join(thumbnails_folder, CHECKPOINT_NAME)
+
+    def run(self, restart=False, report=None):
+        '''
+            Create the thumbnails.
+
+            :param bool restart: True to ignore the saved checkpoint
+            :param callable report: Called with the stats after each batch
+            :return: Stats of the run
+            :rtype: BackfillStats
+        '''
+        after_id = None
+        if not restart:
+            after_id = self.loadCheckpoint()
+        if after_id is not None:
+            self.log.info("Resume after file #%d" % after_id)
+        stats = BackfillStats()
+        while True:
+            files = filesDao.getPageById(after_id, self.batch_size)
+            if len(files) == 0:
+                break
+            self._processBatch(files, stats)
+            after_id = files[-1].id
+            self.saveCheckpoint(after_id)
+            if report is not None:
+                report(stats)
+        self.clearCheckpoint()
+        self.scheduler.shutdown()
+        self.log.info("Backfill completed: %s" % stats)
+        return stats
+
+    def _processBatch(self, files, stats):
+        '''
+            Create the thumbnails of a batch of files and wait for them.
+
+            :param list of IFileLazy files: Files
+            :param BackfillStats stats: Stats to update
+        '''
+        futures = []
+        for tfile in files:
+            if not self.force and not self.thumbnailer.needsThumbnail(tfile):
+                stats.skipped += 1
+                stats.processed += 1
+                continue
+            futures.append(self.scheduler.schedule(tfile, recreate=True))
+        for future in futures:
+            try:
+                thumb = future.result()
+            except Exception as e:
+                self.log.warning("Cannot create thumbnail: %s" % e)
+                thumb = None
+            if thumb is None:
+                stats.failed += 1
+            else:
+                stats.created += 1
+            stats.processed += 1
+
+    def loadCheckpoint(self):
+        '''
+            Get the id of the last file processed by a previous run.
+
+            :return: File id, None if there is no checkpoint
+            :rtype: int
+        '''
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as hand:
+            return json.load(hand)["last_id"]
+
+    def saveCheckpoint(self, last_id):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, 'w') as hand:
+            hand.write(json.dumps({"last_id": last_id}))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clearCheckpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+import os
+import sqlite3
+import time
+from threading import Lock
+
+STATUS_CREATED = "created"
+STATUS_FAILED = "failed"
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS Thumbnails (
+        file_id INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        source_size INTEGER NOT NULL,
+        generator TEXT,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        retry_at REAL,
+        PRIMARY KEY (file_id, size)
+    )
+'''
+
+FOLDER_COVERS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS FolderCovers (
+        folder TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        source TEXT NOT NULL
+    )
+'''
+
+
+class ManifestEntry:
+
+    def __init__(self, row):
+        self.file_id, self.size, self.mtime_ns, self.source_size, \
+            self.generator, self.status, self.attempts, self.retry_at = row
+
+    def matches(self, stat):
+        '''
+            Check if the entry was recorded for the current
+            version of the source file.
+
+            :param os.stat_result stat: Stat of the source file
+            :rtype: bool
+        '''
+        return self.mtime_ns == stat.st_mtime_ns and self.source_size == stat.st_size
+
+    def isCreated(self):
+        return self.status == STATUS_CREATED
+
+    def canRetry(self, now=None):
+        '''
+            Check if a failed thumbnail can be attempted again.
+
+            :rtype: bool
+        '''
+        if self.retry_at is None:
+            return False
+        if now is None:
+            now = time.time()
+        return now >= self.retry_at
+
+
+class ThumbnailManifest:
+    '''
+        Record, for each thumbnail, the mtime and size of the source file
+        it was created from, the program used and the outcome.
+        Stored in a SQLite file next to the thumbnails.
+    '''
+
+    def __init__(self, path, retry_delay=3600, max_retries=5):
+        '''
+            Initialize.
+
+            :param str path: Path of the manifest database
+            :param int retry_delay: Seconds to wait before the first retry of a failed thumbnail,
+                                    the delay doubles at each failure
+            :param int max_retries: Failures after which a thumbnail is not retried
+                                    until the source file changes
+        '''
+        self.path = path
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+        self._connection = None
+        self._lock = Lock()
+
+    def _getConnection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute(SCHEMA)
+            connection.execute(FOLDER_COVERS_SCHEMA)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def get(self, file_id, size):
+        '''
+            Get the entry of a thumbnail.
+
+            :param int file_id: File id
+            :param int size: Thumbnail size
+            :return: The entry, None if the thumbnail was never created
+            :rtype: ManifestEntry
+        '''
+        with self._lock:
+            row = self._getConnection().execute(
+                "SELECT file_id, size, mtime_ns, source_size, generator, status, attempts, retry_at "
+                "FROM Thumbnails WHERE file_id = ? AND size = ?", (file_id, size)).fetchone()
+        if row is None:
+            return None
+        return ManifestEntry(row)
+
+    def setCreated(self, file_id, size, stat, generator):
+        '''
+            Record a thumbnail created from the given version of the source.
+
+            :param int file_id: File id
+            :param int size: Thumbnail size
+            :param os.stat_result stat: Stat of the source file
+            :param str generator: Program used to create the thumbnail
+        '''
+        self._set(file_id, size, stat, generator, STATUS_CREATED, 0, None)
+
+    def setFailed(self, file_id, size, stat, generator, retry=True):
+        '''
+            Record a failed thumbnail creation and schedule the next attempt.
+
+            :param int file_id: File id
+            :param int size: Thumbnail size
+            :param os.stat_result stat: Stat of the source file
+            :param str generator: Program used to create the thumbnail
+            :param bool retry: False if the creation should not be attempted
+                               again until the source file changes
+        '''
+        previous = self.get(file_id, size)
+        attempts = 1
+        if previous is not None and previous.status == STATUS_FAILED and previous.matches(stat):
+            attempts = previous.attempts + 1
+        retry_at = None
+        if retry and attempts < self.max_retries:
+            retry_at = time.time() + self.retry_delay * 2 ** (attempts - 1)
+        self._set(file_id, size, stat, generator, STATUS_FAILED, attempts, retry_at)
+
+    def _set(self, file_id, size, stat, generator, status, attempts, retry_at):
+        with self._lock:
+            connection = self._getConnection()
+            connection.execute(
+                "INSERT OR REPLACE INTO Thumbnails "
+                "(file_id, size, mtime_ns, source_size, generator, status, attempts, retry_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_id, size, stat.st_mtime_ns, stat.st_size, generator, status, attempts, retry_at))
+            connection.commit()
+
+    def getFolderCover(self, folder, stat):
+        '''
+            Get the file chosen for the thumbnail of a folder,
+            if the folder did not change since.
+
+            :param str folder: Path of the folder
+            :param os.stat_result stat: Stat of the folder
+            :return: Path of the file relative to the folder, None if not chosen
+            :rtype: str
+        '''
+        with self._lock:
+            row = self._getConnection().execute(
+                "SELECT mtime_ns, source FROM FolderCovers WHERE folder = ?", (folder,)).fetchone()
+        if row is None or row[0] != stat.st_mtime_ns:
+            return None
+        return row[1]
+
+    def setFolderCover(self, folder, stat, source):
+        '''
+            Record the file chosen for the thumbnail of a folder.
+
+            :param str folder: Path of the folder
+            :param os.stat_result stat: Stat of the folder
+            :param str source: Path of the file relative to the folder
+        '''
+        with self._lock:
+            connection = self._getConnection()
+            connection.execute(
+                "INSERT OR REPLACE INTO FolderCovers (folder, mtime_ns, source) VALUES (?, ?, ?)",
+                (folder, stat.st_mtime_ns, source))
+            connection.commit()
+
+    def remove(self, file_id):
+        '''
+            Remove the entries of all the thumbnails of a file.
+
+            :param int file_id: File id
+        '''
+        with self._lock:
+            connection = self._getConnection()
+            connection.execute("DELETE FROM Thumbnails WHERE file_id = ?", (file_id,))
+            connection.commit()
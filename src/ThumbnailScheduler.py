@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from threading import BoundedSemaphore
+from threading import Lock
+
+from src.Config import ConfigManager
+from src.Logging import createLogger
+
+
+class ThumbnailScheduler:
+    '''
+        Create the thumbnails in a pool of worker threads.
+
+        At most workers thumbnails are created at the same time and at most
+        queue_size more wait to be created: when the queue is full
+        schedule blocks, or gives up if called with block=False.
+        A request is not queued twice: scheduling again a file with the
+        same recreate and path arguments returns the pending future, while
+        a different request of the same file (e.g. recreate=True) is queued
+        and run after the pending ones, so they never write the same
+        thumbnail at the same time.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self, thumbnailer, workers=None, queue_size=None):
+        '''
+            Initialize.
+
+            :param Thumbnailer thumbnailer: Thumbnailer used to create the thumbnails
+            :param int workers: Maximum number of thumbnails created at the same time
+            :param int queue_size: Maximum number of thumbnails waiting
+        '''
+        if workers is None:
+            workers = ConfigManager.THUMBNAILS.getWorkers()
+        if queue_size is None:
+            queue_size = ConfigManager.THUMBNAILS.getQueueSize()
+        self.thumbnailer = thumbnailer
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="thumbnailer")
+        self._slots = BoundedSemaphore(workers + queue_size)
+        self._pending = {}
+        self._lock = Lock()
+
+    def schedule(self, tfile, callback=None, recreate=False, path=None, block=True):
+        '''
+            Schedule the creation of the thumbnail of a file.
+
+            :param dao.entities.IFileLazy tfile: File
+            :param callable callback: Called with the future when the thumbnail is ready
+            :param bool recreate: True to overwrite an existing thumbnail
+            :param str path: File to use to create the thumbnail
+            :param bool block: False to give up if the queue is full
+            :return: Future resolved with the path of the thumbnail (None in case of errors),
+                     None if the queue is full and block is False
+            :rtype: concurrent.futures.Future
+        '''
+        key = (tfile.id, recreate, path)
+        future = self._getPending(key)
+        if future is None:
+            if not self._slots.acquire(blocking=block):
+                self.log.debug("Queue full, skip thumbnail for %d" % tfile.id)
+                return None
+            submitted = False
+            with self._lock:
+                future = self._pending.get(key)
+                if future is None:
+                    previous = list(map(lambda item: item[1],
+                                        filter(lambda item: item[0][0] == tfile.id, self._pending.items())))
+                    future = self._executor.submit(self._create, tfile, recreate, path, previous)
+                    self._pending[key] = future
+                    submitted = True
+            if submitted:
+                future.add_done_callback(lambda f: self._onDone(key))
+            else:
+                # Scheduled by another thread in the meantime
+                self._slots.release()
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def isPending(self, tfile):
+        '''
+            Check if the thumbnail of a file is waiting to be created.
+
+            :param dao.entities.IFileLazy tfile: File
+            :rtype: bool
+        '''
+        with self._lock:
+            return any(map(lambda key: key[0] == tfile.id, self._pending))
+
+    def shutdown(self, wait=True):
+        '''
+            Stop the workers.
+
+            :param bool wait: True to wait for the pending thumbnails
+        '''
+        self._executor.shutdown(wait=wait)
+
+    def _getPending(self, key):
+        with self._lock:
+            return self._pending.get(key)
+
+    def _create(self, tfile, recreate, path, previous):
+        # The previous requests were submitted first, so they are
+        # already running in another worker or done
+        wait(previous)
+        if path is not None:
+            return self.thumbnailer.createThumbnailFrom(tfile, path)
+        elif recreate:
+            return self.thumbnailer.recreateThumbnail(tfile)
+        else:
+            return self.thumbnailer.getThumbnail(tfile)
+
+    def _onDone(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+        self._slots.release()
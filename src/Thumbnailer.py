@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
 import os
-from subprocess import Popen
+import subprocess
+from mimetypes import guess_type as guessType
 
 try:
     from natsort import natsorted
@@ -10,7 +11,9 @@ except ImportError:
         return sorted(data, key=f)
 
 from src.Config import ConfigManager
+from src.Logging import createLogger
 from src.Utils import guessMime
+from src.ThumbnailManifest import ThumbnailManifest
 
 # Create/view file preview
 
@@ -23,38 +26,74 @@ THUMB_FOLDER = 2
 
 THUMB_EXTENSION = '.png'
 
+GENERATORS = {
+    THUMB_VIDEO: "ffmpegthumbnailer",
+    THUMB_IMAGE: "convert",
+    THUMB_FOLDER: "folder"
+}
+
+MANIFEST_NAME = "manifest.db"
+
+# Files tried for the thumbnail of a folder before giving up
+FOLDER_ATTEMPTS = 3
+
 
 class Thumbnailer():
 
+    log = createLogger(__name__)
+
     def __init__(self, icon_size):
         self.thumbnails_folder = os.path.join(ConfigManager.profile_folder, "thumbnails/")
-        self.thumbnails_fail_folder = os.path.join(ConfigManager.profile_folder, "thumbnails_fail/")
         self.icon_size = icon_size
+        self.timeout = ConfigManager.THUMBNAILS.getTimeout()
+        self.manifest = ThumbnailManifest(os.path.join(self.thumbnails_folder, MANIFEST_NAME),
+                                          retry_delay=ConfigManager.THUMBNAILS.getRetryDelay(),
+                                          max_retries=ConfigManager.THUMBNAILS.getMaxRetries())
 
     def getThumbnail(self, tfile):
         '''
-            Return a thumbnail for the given file.
+            Return a thumbnail for the given file, create it if
+            it is missing or older than the file.
+            The thumbnail is created in the calling thread, use
+            ThumbnailScheduler to create it in background.
 
             :param IFile tfile: File
-            :return: path of the thumbnail
+            :return: path of the thumbnail, None if it cannot be created
             :rtype: str
         '''
-        relpath = os.path.join(tfile.relpath, tfile.name)
-        path = os.path.join(ConfigManager.getRoot(), relpath)
-        if not os.path.exists(path):
+        path = self._getSourcePath(tfile)
+        stat = self._stat(path)
+        if stat is None:
             return None
         thumb_path = self._getThumbnailPath(tfile)
-        if os.path.exists(thumb_path):
-            return thumb_path
-        fail_path = self._getThumbnailFailPath(tfile)
+        entry = self._getEntry(tfile, stat)
+        if entry is not None:
+            if entry.isCreated():
+                return thumb_path
+            elif not entry.canRetry():
+                return None
         thumb_type = self.getThumbnailType(path)
         if thumb_type is None:
+            self.manifest.setFailed(tfile.id, self.icon_size, stat, None, retry=False)
             return None
-        elif not os.path.exists(fail_path):
-            self.createThumbnail(path, thumb_path, thumb_type)
-            return thumb_path
-        else:
-            return None
+        return self._create(tfile, stat, path, thumb_path, thumb_type)
+
+    def needsThumbnail(self, tfile):
+        '''
+            Check if the thumbnail of a file should be created now:
+            it is missing or stale and the last attempt did not fail
+            (or the retry delay is over).
+
+            :param dao.entities.IFileLazy tfile: File
+            :rtype: bool
+        '''
+        stat = self._stat(self._getSourcePath(tfile))
+        if stat is None:
+            return False
+        entry = self._getEntry(tfile, stat)
+        if entry is None:
+            return True
+        return not entry.isCreated() and entry.canRetry()
 
     def recreateThumbnail(self, tfile):
         '''
@@ -64,14 +103,13 @@ class Thumbnailer():
             :return: The path of the thumbnail created, None in case of errors
             :rtype: str
         '''
-        relpath = os.path.join(tfile.relpath, tfile.name)
-        path = os.path.join(ConfigManager.getRoot(), relpath)
-        if not os.path.exists(path):
+        path = self._getSourcePath(tfile)
+        stat = self._stat(path)
+        if stat is None:
             return None
         thumb_path = self._getThumbnailPath(tfile)
         thumb_type = self.getThumbnailType(path)
-        self.createThumbnail(path, thumb_path, thumb_type)
-        return thumb_path
+        return self._create(tfile, stat, path, thumb_path, thumb_type)
 
     def createThumbnailFrom(self, tfile, path):
         '''
@@ -89,8 +127,63 @@ class Thumbnailer():
         if thumb_type is None:
             return None
         thumb_path = self._getThumbnailPath(tfile)
-        self.createThumbnail(path, thumb_path, thumb_type)
-        return thumb_path
+        stat = self._stat(self._getSourcePath(tfile))
+        return self._create(tfile, stat, path, thumb_path, thumb_type)
+
+    def _create(self, tfile, stat, path, thumb_path, thumb_type):
+        '''
+            Create a thumbnail and record the outcome in the manifest.
+
+            :param dao.entities.IFileLazy file: File
+            :param os.stat_result stat: Stat of the file, None to skip the manifest
+            :param str path: Path of the file used to create the thumbnail
+            :return: The path of the thumbnail created, None in case of errors
+            :rtype: str
+        '''
+        created = self.createThumbnail(path, thumb_path, thumb_type)
+        if stat is not None:
+            generator = GENERATORS.get(thumb_type)
+            if created:
+                self.manifest.setCreated(tfile.id, self.icon_size, stat, generator)
+            else:
+                self.manifest.setFailed(tfile.id, self.icon_size, stat, generator,
+                                        retry=thumb_type is not None)
+        if created:
+            return thumb_path
+        else:
+            return None
+
+    def _getEntry(self, tfile, stat):
+        '''
+            Get the manifest entry of the thumbnail of a file,
+            if it matches the current version of the file.
+            A thumbnail created before the manifest existed is
+            recorded if it is newer than the file.
+
+            :param dao.entities.IFileLazy file: File
+            :param os.stat_result stat: Stat of the file
+            :return: The entry, None if the thumbnail is missing or stale
+            :rtype: ThumbnailManifest.ManifestEntry
+        '''
+        entry = self.manifest.get(tfile.id, self.icon_size)
+        if entry is None:
+            thumb_stat = self._stat(self._getThumbnailPath(tfile))
+            if thumb_stat is not None and thumb_stat.st_mtime_ns >= stat.st_mtime_ns:
+                self.manifest.setCreated(tfile.id, self.icon_size, stat, None)
+                entry = self.manifest.get(tfile.id, self.icon_size)
+        elif not entry.matches(stat):
+            entry = None
+        return entry
+
+    def _getSourcePath(self, tfile):
+        relpath = os.path.join(tfile.relpath, tfile.name)
+        return os.path.join(ConfigManager.getRoot(), relpath)
+
+    def _stat(self, path):
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
 
     def _getThumbnailPath(self, tfile):
         '''
@@ -103,10 +196,6 @@ class Thumbnailer():
         icon_folder = os.path.join(self.thumbnails_folder, str(self.icon_size))
         return os.path.join(icon_folder, str(tfile.id) + THUMB_EXTENSION)
 
-    def _getThumbnailFailPath(self, tfile):
-        icon_folder = os.path.join(self.thumbnails_fail_folder, str(self.icon_size))
-        return os.path.join(icon_folder, str(tfile.id) + THUMB_EXTENSION)
-
     def removeThumbnail(self, tfile):
         '''
             Remove the thumbnails associated with the given file.
@@ -114,14 +203,21 @@ class Thumbnailer():
             :param dao.entities.IFileLazy tfile: File
         '''
         thumb_file = self._getThumbnailPath(tfile)
-        thumb_fail_file = self._getThumbnailFailPath(tfile)
         if os.path.exists(thumb_file):
             os.remove(thumb_file)
-        if os.path.exists(thumb_fail_file):
-            os.remove(thumb_fail_file)
+        self.manifest.remove(tfile.id)
 
     def getThumbnailType(self, path):
-        mime = guessMime(path)
+        return self.getMimeThumbnailType(guessMime(path))
+
+    def getMimeThumbnailType(self, mime):
+        '''
+            Get the type of thumbnail for a mime.
+
+            :param str mime: Mime
+            :return: Thumbnail type, None if the mime has no thumbnail
+            :rtype: int
+        '''
         if mime == 'inode/directory':
             return THUMB_FOLDER
         elif mime in VIDEO_MIMES:
@@ -131,44 +227,142 @@ class Thumbnailer():
         return None
 
     def createThumbnail(self, path, thumb_file, thumb_type):
+        '''
+            Create a thumbnail and wait for its creation.
+
+            :return: True if the thumbnail was created, False otherwise
+            :rtype: bool
+        '''
         thumb_folder = os.path.dirname(thumb_file)
-        if not os.path.isdir(thumb_folder):
-            os.makedirs(thumb_folder)
+        os.makedirs(thumb_folder, exist_ok=True)
         if thumb_type == THUMB_VIDEO:
-            self.createVideoThumbnail(path, thumb_file)
+            return self.createVideoThumbnail(path, thumb_file)
         elif thumb_type == THUMB_IMAGE:
-            self.createImageThumbnail(path, thumb_file)
+            return self.createImageThumbnail(path, thumb_file)
         elif thumb_type == THUMB_FOLDER:
-            self.createFolderThumbnail(path, thumb_file)
+            return self.createFolderThumbnail(path, thumb_file)
         else:
             return False
 
     def createVideoThumbnail(self, path, thumb_file):
         args = ["ffmpegthumbnailer", "-i", path, "-o", thumb_file, "-s", str(self.icon_size) ]
-        process = Popen(args)
+        return self._run(args, thumb_file)
 
     def createImageThumbnail(self, path, thumb_file):
         icon_format = str(self.icon_size) + "x" + str(self.icon_size)
         args = ["convert", path, "-thumbnail", icon_format, thumb_file]
-        process = Popen(args)
+        return self._run(args, thumb_file)
 
     def createFolderThumbnail(self, path, thumb_file):
-        fnames = self._getFilesInFolder(path)
-        for fname in fnames:
-            fpath = os.path.join(path, fname)
-            if not os.path.isdir(fpath):
-                mime = guessMime(fpath)
-                if mime in VIDEO_MIMES:
-                    self.createVideoThumbnail(fpath, thumb_file)
-                    break
-                elif mime in IMAGE_MIMES:
-                    self.createImageThumbnail(fpath, thumb_file)
-                    break
-
-    def _getFilesInFolder(self, location):
-        result = []
-        for root, _, files in os.walk(location):
-            for fname in files:
-                result.append(os.path.join(root, fname))
-        sr = natsorted(result, lambda x : x.lower())
-        return sr
+        '''
+            Create the thumbnail of a folder from the first image or video
+            found by _getFolderCandidates.
+            The file used is recorded in the manifest and reused until
+            the folder changes.
+
+            :return: True if the thumbnail was created, False otherwise
+            :rtype: bool
+        '''
+        stat = self._stat(path)
+        if stat is None:
+            return False
+        source = self.manifest.getFolderCover(path, stat)
+        if source is not None:
+            fpath = os.path.join(path, source)
+            thumb_type = self._getMediaThumbnailType(fpath)
+            if thumb_type is not None and self.createThumbnail(fpath, thumb_file, thumb_type):
+                return True
+        attempts = 0
+        for fpath, thumb_type in self._getFolderCandidates(path):
+            if self.createThumbnail(fpath, thumb_file, thumb_type):
+                self.manifest.setFolderCover(path, stat, os.path.relpath(fpath, path))
+                return True
+            attempts += 1
+            if attempts == FOLDER_ATTEMPTS:
+                break
+        return False
+
+    def _getFolderCandidates(self, location):
+        '''
+            Find the images and videos of a folder, lazily, the ones closer
+            to the folder first: the folders are listed one level at a time
+            and are not listed anymore once a usable file is taken.
+            In each level the files named like the configured folder covers
+            (e.g. cover.jpg) come first, then the files with the extension
+            of an image or video, then the others, in natural order.
+            Only the files tried are read to detect their mime.
+
+            :param str location: Path of the folder
+            :return: Path and thumbnail type of the candidates
+            :rtype: generator of tuple
+        '''
+        covers = list(map(lambda name: name.lower(), ConfigManager.THUMBNAILS.getFolderCovers() or []))
+        def getRank(entry):
+            name, _ = os.path.splitext(entry.name)
+            name = name.lower()
+            cover = covers.index(name) if name in covers else len(covers)
+            mime, _ = guessType(entry.name)
+            media = mime in VIDEO_MIMES or mime in IMAGE_MIMES or \
+                (mime is not None and mime.split('/')[0] in ('image', 'video'))
+            return cover, 0 if media else 1
+        level = [location]
+        while len(level) > 0:
+            files = []
+            next_level = []
+            for folder in level:
+                try:
+                    with os.scandir(folder) as iterator:
+                        entries = natsorted(list(iterator), lambda entry: entry.name.lower())
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_dir():
+                        # Like os.walk, the links to folders are not followed
+                        if not entry.is_symlink():
+                            next_level.append(entry.path)
+                    else:
+                        files.append(entry)
+            for entry in sorted(files, key=getRank):
+                thumb_type = self._getMediaThumbnailType(entry.path)
+                if thumb_type is not None:
+                    yield entry.path, thumb_type
+            level = next_level
+
+    def _getMediaThumbnailType(self, path):
+        '''
+            Get the thumbnail type of an image or video.
+
+            :return: THUMB_VIDEO, THUMB_IMAGE or None
+            :rtype: int
+        '''
+        try:
+            mime = guessMime(path)
+        except OSError:
+            return None
+        if mime in VIDEO_MIMES:
+            return THUMB_VIDEO
+        elif mime in IMAGE_MIMES:
+            return THUMB_IMAGE
+        return None
+
+    def _run(self, args, thumb_file):
+        '''
+            Run a thumbnailer process and wait for it to exit.
+            The process is killed if it runs for more than the configured timeout.
+
+            :param list of str args: Command line
+            :param str thumb_file: Path of the thumbnail created by the process
+            :return: True if the thumbnail was created, False otherwise
+            :rtype: bool
+        '''
+        try:
+            process = subprocess.run(args, timeout=self.timeout or None)
+        except subprocess.TimeoutExpired:
+            self.log.warning("%s timed out after %ss" % (args[0], self.timeout))
+            # Do not keep a partially written thumbnail
+            if os.path.exists(thumb_file):
+                os.remove(thumb_file)
+            return False
+        except OSError:
+            return False
+        return process.returncode == 0 and os.path.exists(thumb_file)
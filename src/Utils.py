@@ -6,17 +6,51 @@ except ImportError:
     import json
 
 import os
+import stat
 import importlib.util
 from mimetypes import guess_extension as guessExtension
 
 from magic import Magic
 
+from src.MimeCache import mimeCache
+
 mimeMagic = Magic(mime=True)
 
+# Extensions always detected by libmagic with the same mime,
+# the files with these extensions are not read
+EXTENSION_MIMES = {
+    '.avi': 'video/x-msvideo',
+    '.djvu': 'image/vnd.djvu',
+    '.gif': 'image/gif',
+    '.jpeg': 'image/jpeg',
+    '.jpg': 'image/jpeg',
+    '.mkv': 'video/x-matroska',
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.webm': 'video/webm',
+}
+
 def guessMime(path):
-    if os.path.isdir(path):
+    '''
+        Get the mime of a file.
+        The mime is guessed from the extension if unambiguous,
+        otherwise it is detected with libmagic and cached
+        until the file changes.
+
+        :param str path: Path
+        :rtype: str
+    '''
+    file_stat = os.stat(path)
+    if stat.S_ISDIR(file_stat.st_mode):
         return 'inode/directory'
-    return mimeMagic.from_file(path)
+    mime = EXTENSION_MIMES.get(os.path.splitext(path)[1].lower())
+    if mime is not None:
+        return mime
+    mime = mimeCache.get(file_stat)
+    if mime is None:
+        mime = mimeMagic.from_file(path)
+        mimeCache.put(file_stat, mime)
+    return mime
 
 def loadModuleFromPath(name, module_path):
     if not os.path.exists(module_path):
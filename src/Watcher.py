@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import signal
+import struct
+import time
+
+from src.Config import ConfigManager
+from src.Logging import createLogger
+from src.Scanner import LibraryScanner
+from src.Scanner import ROOT_RELPATH
+from src.Thumbnailer import Thumbnailer
+from src.ThumbnailScheduler import ThumbnailScheduler
+from src.dao import filesDao
+from src.dao.Common import disposeAfterFork
+
+# Seconds without events after which a burst of events is applied
+SETTLE_DELAY = 0.5
+# Maximum seconds an event waits to be applied during a long burst
+MAX_DELAY = 5
+
+THUMBNAIL_SIZE = 256
+
+# inotify constants, from sys/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+             IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+PR_SET_PDEATHSIG = 1
+
+log = createLogger(__name__)
+
+
+def _loadLibc():
+    name = ctypes.util.find_library('c') or 'libc.so.6'
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, 'inotify_init1'):
+        return None
+    return libc
+
+libc = _loadLibc()
+
+def isAvailable():
+    '''
+        Check if inotify is available on this system.
+
+        :rtype: bool
+    '''
+    return libc is not None
+
+
+class Inotify:
+    '''
+        Minimal inotify binding with ctypes.
+    '''
+
+    def __init__(self):
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def addWatch(self, path, mask):
+        '''
+            Watch a path, or change the mask of a watched path.
+
+            :param str path: Path
+            :param int mask: Events to watch
+            :return: Watch descriptor
+            :rtype: int
+        '''
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def removeWatch(self, wd):
+        libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout):
+        '''
+            Wait for events.
+
+            :param float timeout: Seconds to wait, None to wait forever
+            :return: Watch descriptor, mask, cookie and name of the events
+            :rtype: list of tuple
+        '''
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if len(ready) == 0:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            events.append((wd, mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LibraryWatcher:
+    '''
+        Keep the database in sync with the root folder using inotify.
+
+        The folders scanned by the LibraryScanner are watched. The events
+        are collected until no event arrives for SETTLE_DELAY seconds
+        (at most MAX_DELAY seconds), then the folders they touched are
+        scanned again in batches: new files are inserted and renamed or
+        moved files are updated, see LibraryScanner.
+        The thumbnails of the new and rewritten files are queued.
+        When the kernel queue overflows the whole root is scanned.
+    '''
+
+    def __init__(self, settle_delay=SETTLE_DELAY, max_delay=MAX_DELAY):
+        '''
+            Initialize.
+
+            :param float settle_delay: Seconds without events after which the changes are applied
+            :param float max_delay: Maximum seconds the changes wait to be applied
+        '''
+        self.root = ConfigManager.getRoot()
+        self.settle_delay = settle_delay
+        self.max_delay = max_delay
+        self.thumbnailer = Thumbnailer(THUMBNAIL_SIZE)
+        self.scheduler = ThumbnailScheduler(self.thumbnailer)
+        self.scanner = LibraryScanner(listener=self._onInserted)
+        self.inotify = Inotify()
+        self.watches = {}
+        self.paths = {}
+        self.stopping = False
+
+    def run(self):
+        '''
+            Watch the root folder until stop is called.
+        '''
+        log.info("Scan %s" % self.root)
+        log.info("Scan completed: %s" % self.scanner.run())
+        self._syncWatches()
+        log.info("Watching %d folders" % len(self.watches))
+        dirty = set()
+        modified = set()
+        overflow = False
+        first = None
+        last = None
+        while not self.stopping:
+            timeout = 1
+            if first is not None:
+                timeout = max(0, min(last + self.settle_delay, first + self.max_delay) - time.monotonic())
+            try:
+                events = self.inotify.read(timeout)
+            except InterruptedError:
+                continue
+            now = time.monotonic()
+            for wd, mask, cookie, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & IN_IGNORED:
+                    self._forgetWatch(wd)
+                    continue
+                else:
+                    relpath = self.paths.get(wd)
+                    if relpath is None or name.startswith('.'):
+                        continue
+                    if mask & IN_CLOSE_WRITE:
+                        modified.add((relpath, name))
+                    else:
+                        dirty.add(relpath)
+                if first is None:
+                    first = now
+                last = now
+            if first is not None and (now >= last + self.settle_delay or now >= first + self.max_delay):
+                self._apply(dirty, modified, overflow)
+                dirty = set()
+                modified = set()
+                overflow = False
+                first = None
+        self.scheduler.shutdown(wait=False)
+        self.inotify.close()
+        log.info("Watcher stopped")
+
+    def stop(self):
+        self.stopping = True
+
+    def _apply(self, dirty, modified, overflow):
+        '''
+            Apply a burst of events.
+
+            :param set of str dirty: Folders with entries added, removed or renamed
+            :param set of tuple modified: Relpath and name of the files written
+            :param bool overflow: True if some events were lost
+        '''
+        if overflow:
+            log.warning("Events lost, scanning the whole root")
+            stats = self.scanner.run()
+        else:
+            stats = self.scanner.run(relpaths=dirty)
+        log.info("Synchronised %d folders: %s" % (len(dirty), stats))
+        added = self._syncWatches()
+        if len(added) > 0:
+            # Entries created before the new folders were watched
+            self.scanner.run(relpaths=added)
+        for relpath, name in modified:
+            file = filesDao.getByPath(relpath, name)
+            if file is not None:
+                self._queueThumbnail(file)
+
+    def _syncWatches(self):
+        '''
+            Watch the folders scanned and stop watching the removed ones.
+
+            :return: Relpaths of the folders watched from now
+            :rtype: set of str
+        '''
+        wanted = self.scanner.getDirectories()
+        # Remove first: a renamed folder keeps its inode and its watch descriptor
+        for relpath in set(self.watches) - wanted:
+            wd = self.watches.pop(relpath)
+            self.paths.pop(wd, None)
+            self.inotify.removeWatch(wd)
+        added = set()
+        for relpath in wanted - set(self.watches):
+            path = self.root if relpath == ROOT_RELPATH else os.path.join(self.root, relpath)
+            try:
+                wd = self.inotify.addWatch(path, WATCH_MASK)
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    log.error("Too many folders, increase fs.inotify.max_user_watches")
+                    break
+                continue
+            previous = self.paths.get(wd)
+            if previous is not None:
+                self.watches.pop(previous, None)
+            self.watches[relpath] = wd
+            self.paths[wd] = relpath
+            added.add(relpath)
+        return added
+
+    def _forgetWatch(self, wd):
+        relpath = self.paths.pop(wd, None)
+        if relpath is not None and self.watches.get(relpath) == wd:
+            del self.watches[relpath]
+
+    def _onInserted(self, file_ids):
+        for file_id in file_ids:
+            file = filesDao.getById(file_id)
+            if file is not None:
+                self._queueThumbnail(file)
+
+    def _queueThumbnail(self, file):
+        if self.thumbnailer.needsThumbnail(file):
+            self.scheduler.schedule(file, recreate=True, block=False)
+
+
+def _setParentDeathSignal(signum):
+    '''
+        Ask the kernel to send a signal to this process when the parent exits.
+    '''
+    libc.prctl(PR_SET_PDEATHSIG, signum, 0, 0, 0)
+
+def startWatcher():
+    '''
+        Run the watcher in a child process, stopped on SIGTERM
+        and when the parent process exits.
+
+        :return: Pid of the watcher process
+        :rtype: int
+    '''
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    status = 0
+    try:
+        _setParentDeathSignal(signal.SIGTERM)
+        # Stopped by the parent, not by the Ctrl+C sent to the process group
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        disposeAfterFork()
+        watcher = LibraryWatcher()
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+        watcher.run()
+    except Exception as e:
+        log.error("Watcher failed: %s" % e)
+        status = 1
+    finally:
+        os._exit(status)
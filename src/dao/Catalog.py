@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+from threading import RLock
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from .Common import sessionMaker
+from .Common import SESSION_CHANGES
+
+from .entities.Persistent import Tag
+from .entities.Persistent import Metatag
+from .entities.Common import ITagLazy
+from .entities.Common import IMetatagLazy
+
+
+class CatalogDelta:
+    '''
+        Entities changed in the catalog after a given version.
+    '''
+
+    def __init__(self, version, changed, removed):
+        '''
+            Initialize.
+
+            :param int version: Current version of the catalog
+            :param list changed: Entities added or updated
+            :param set of int removed: Ids of the entities deleted
+        '''
+        self.version = version
+        self.changed = changed
+        self.removed = removed
+
+    def isEmpty(self):
+        return len(self.changed) == 0 and len(self.removed) == 0
+
+    def apply(self, entities):
+        '''
+            Apply the changes to a list of entities sorted by name.
+
+            :param list entities: Entities at the version the delta was asked for
+            :return: The entities at the current version, sorted by name
+            :rtype: list
+        '''
+        if self.isEmpty():
+            return entities
+        changed_ids = set(map(lambda entity: entity.id, self.changed))
+        result = list(filter(lambda entity: entity.id not in changed_ids and
+                                            entity.id not in self.removed, entities))
+        result.extend(self.changed)
+        result.sort(key=lambda entity: entity.name)
+        return result
+
+
+class CatalogTable:
+    '''
+        Cached entities of a table with the version of their last change.
+    '''
+
+    def __init__(self):
+        self.entities = None
+        self.dirty = set()
+        self.versions = {}
+
+    def invalidate(self, entity_id, version):
+        self.dirty.add(entity_id)
+        self.versions[entity_id] = version
+
+    def getSorted(self):
+        return sorted(self.entities.values(), key=lambda entity: entity.name)
+
+    def getDelta(self, version, current_version):
+        changed = []
+        removed = set()
+        for entity_id, changed_version in self.versions.items():
+            if changed_version <= version:
+                continue
+            entity = self.entities.get(entity_id)
+            if entity is None:
+                removed.add(entity_id)
+            else:
+                changed.append(entity)
+        return CatalogDelta(current_version, changed, removed)
+
+
+class Catalog:
+    '''
+        Process-wide read-through cache of all the tags and metatags.
+
+        The tags and metatags are loaded on the first request and the
+        entities changed by EntityDAO are reloaded when the transaction
+        that changed them is committed. Each change increments the version
+        of the catalog, so callers holding the entities of a previous
+        version can ask only for the changes since then.
+        The returned entities are shared and must not be modified.
+    '''
+
+    def __init__(self):
+        self.version = 0
+        self._tags = CatalogTable()
+        self._metatags = CatalogTable()
+        self._lock = RLock()
+
+    def getTags(self):
+        '''
+            Get all the tags.
+
+            :return: Version of the catalog and tags sorted by name
+            :rtype: int, list of entities.Common.ITagLazy
+        '''
+        with self._lock:
+            self._refresh()
+            return self.version, self._tags.getSorted()
+
+    def getMetatags(self):
+        '''
+            Get all the metatags.
+
+            :return: Version of the catalog and metatags sorted by name
+            :rtype: int, list of entities.Common.IMetatagLazy
+        '''
+        with self._lock:
+            self._refresh()
+            return self.version, self._metatags.getSorted()
+
+    def getTagsSince(self, version):
+        '''
+            Get the tags changed after a given version.
+
+            :param int version: Version of the tags held by the caller
+            :rtype: CatalogDelta
+        '''
+        with self._lock:
+            self._refresh()
+            return self._tags.getDelta(version, self.version)
+
+    def getMetatagsSince(self, version):
+        '''
+            Get the metatags changed after a given version.
+
+            :param int version: Version of the metatags held by the caller
+            :rtype: CatalogDelta
+        '''
+        with self._lock:
+            self._refresh()
+            return self._metatags.getDelta(version, self.version)
+
+    def invalidate(self, persistent_entity, entity_id):
+        '''
+            Mark an entity as changed, the other entities are ignored.
+
+            :param persistent_entity: Persistent entity class
+            :param int entity_id: Id of the changed entity
+        '''
+        if persistent_entity is not Tag and persistent_entity is not Metatag:
+            return
+        with self._lock:
+            self.version += 1
+            if persistent_entity is Tag:
+                self._tags.invalidate(entity_id, self.version)
+            else:
+                self._metatags.invalidate(entity_id, self.version)
+                # The tags embed their metatag
+                if self._tags.entities is not None:
+                    for tag in self._tags.entities.values():
+                        if tag.metatag.id == entity_id:
+                            self._tags.invalidate(tag.id, self.version)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._tags = CatalogTable()
+            self._metatags = CatalogTable()
+
+    def _refresh(self):
+        '''
+            Load the catalog or reload the changed entities.
+        '''
+        if self._tags.entities is not None and len(self._tags.dirty) == 0 \
+                and len(self._metatags.dirty) == 0:
+            return
+        session = sessionMaker()
+        try:
+            self._refreshTable(session, self._metatags, Metatag, IMetatagLazy)
+            self._refreshTable(session, self._tags, Tag, ITagLazy, joinedload(Tag.metatag))
+        finally:
+            session.close()
+
+    def _refreshTable(self, session, table, persistent_entity, entity, options=None):
+        query = session.query(persistent_entity)
+        if options is not None:
+            query = query.options(options)
+        if table.entities is None:
+            table.entities = dict(map(lambda p: (p.id, entity(p)), query))
+        elif len(table.dirty) > 0:
+            dirty = list(table.dirty)
+            for entity_id in dirty:
+                table.entities.pop(entity_id, None)
+            for persistent in query.filter(persistent_entity.id.in_(dirty)):
+                table.entities[persistent.id] = entity(persistent)
+        table.dirty.clear()
+
+
+def _onCommit(session):
+    for persistent_entity, entity_id in session.info.pop(SESSION_CHANGES, []):
+        catalog.invalidate(persistent_entity, entity_id)
+
+def _onRollback(session, previous_transaction):
+    session.info.pop(SESSION_CHANGES, None)
+
+
+catalog = Catalog()
+event.listen(sessionMaker, "after_commit", _onCommit)
+event.listen(sessionMaker, "after_soft_rollback", _onRollback)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import time
+
+from sqlalchemy import event
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from .Common import engine
+from .Common import sessionMaker
+from .Common import SESSION_CHANGES
+
+from .entities.Persistent import change_versions
+
+# Session info key of the tables changed by the committing transaction
+SESSION_TABLES = "changed-tables"
+
+
+class TableVersion:
+
+    def __init__(self, name, version, modified):
+        self.name = name
+        self.version = version
+        self.modified = modified
+
+
+class ChangeVersions:
+    '''
+        Change counters of the tables, stored in the ChangeVersions table.
+
+        The counter of a table is incremented in the same transaction as
+        the changes recorded by the DAOs, so a version read from the
+        database always matches the committed content of the table.
+        The counters are shared by all the processes using the database.
+    '''
+
+    def __init__(self):
+        self._listeners = []
+
+    def addListener(self, listener):
+        '''
+            Add a function called with the names of the changed tables
+            after each commit of this process changing some tables.
+
+            :param callable listener: Function of a set of table names
+        '''
+        self._listeners.append(listener)
+
+    def notify(self, names):
+        for listener in self._listeners:
+            listener(names)
+
+    def get(self, names):
+        '''
+            Get the versions of some tables.
+            A table never changed has version 0 and no modification time.
+
+            :param list of str names: Table names
+            :return: Versions in the same order as the names
+            :rtype: list of TableVersion
+        '''
+        query = select(change_versions).where(change_versions.c.name.in_(names))
+        with engine.connect() as connection:
+            rows = dict(map(lambda row: (row.name, row), connection.execute(query)))
+        versions = []
+        for name in names:
+            row = rows.get(name)
+            if row is None:
+                versions.append(TableVersion(name, 0, None))
+            else:
+                versions.append(TableVersion(name, row.version, row.modified))
+        return versions
+
+    def increment(self, connection, names):
+        '''
+            Increment the versions of some tables.
+
+            :param connection: Connection or session of the transaction
+            :param iterable of str names: Table names
+        '''
+        now = time.time()
+        for name in sorted(set(names)):
+            query = insert(change_versions).values(name=name, version=1, modified=now)
+            query = query.on_conflict_do_update(index_elements=[change_versions.c.name],
+                                                set_={'version': change_versions.c.version + 1,
+                                                      'modified': now})
+            connection.execute(query)
+
+
+def _getTableName(entity):
+    '''
+        Get the table name of a persistent entity class or of a table.
+    '''
+    if hasattr(entity, '__tablename__'):
+        return entity.__tablename__
+    return entity.name
+
+def _onBeforeCommit(session):
+    changes = session.info.get(SESSION_CHANGES)
+    if not changes:
+        return
+    names = set(map(lambda change: _getTableName(change[0]), changes))
+    changeVersions.increment(session, names)
+    session.info[SESSION_TABLES] = names
+
+def _onCommit(session):
+    names = session.info.pop(SESSION_TABLES, None)
+    if names:
+        changeVersions.notify(names)
+
+def _onRollback(session, previous_transaction):
+    session.info.pop(SESSION_TABLES, None)
+
+
+changeVersions = ChangeVersions()
+event.listen(sessionMaker, "before_commit", _onBeforeCommit)
+event.listen(sessionMaker, "after_commit", _onCommit)
+event.listen(sessionMaker, "after_soft_rollback", _onRollback)
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
 import os
+from contextlib import contextmanager
+from threading import local
 
 from sqlalchemy import create_engine
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import exc
 from sqlalchemy.sql.expression import func
@@ -12,18 +15,98 @@ from src.Logging import createLogger
 
 logger = createLogger("CommonDAO")
 
+def _getPragmas():
+    '''
+        Get the configured SQLite pragmas, skipping the invalid values.
+
+        :return: List of pragma names and values
+        :rtype: list of tuple
+    '''
+    pragmas = []
+    for name, value in ConfigManager.DB.getPragmas():
+        if type(value) == int or (type(value) == str and value.isalnum()):
+            pragmas.append((name, value))
+        else:
+            logger.warning("Invalid value for pragma %s: %s" % (name, value))
+    return pragmas
+
+def _setPragmas(dbapi_connection, connection_record):
+    '''
+        Apply the configured pragmas on a new connection.
+    '''
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas:
+        cursor.execute("PRAGMA %s = %s" % (name, value))
+    cursor.close()
+
+def _logPragmas():
+    '''
+        Log the values of the pragmas active on the connections.
+    '''
+    with engine.connect() as connection:
+        for name, _ in pragmas:
+            value = connection.exec_driver_sql("PRAGMA %s" % name).scalar()
+            logger.info("SQLite %s: %s" % (name, value))
+
 db_path = os.path.join(ConfigManager.profile_folder, 'data.db')
 engine = create_engine('sqlite:///' + db_path, echo=ConfigManager.debugSql)
+pragmas = _getPragmas()
+event.listen(engine, "connect", _setPragmas)
 if not os.path.exists(db_path):
     logger.info("Create database: " + db_path)
-    from .entities.Persistent import Base
-    Base.metadata.create_all(engine)
+# Create the missing tables, also the ones added to an existing database
+from .entities.Persistent import Base
+Base.metadata.create_all(engine, checkfirst=True)
+_logPragmas()
+
+from .Search import searchIndex
+searchIndex.setup(engine)
 
 sessionMaker = sessionmaker(bind=engine,
                             expire_on_commit=False)
 
+def disposeAfterFork():
+    '''
+        Discard the connections inherited from the parent process,
+        to be called in a forked child before using the database.
+    '''
+    engine.dispose(close=False)
+
+# Number of rows converted at a time by the iterators
+STREAM_CHUNK_SIZE = 500
+
+# Key of the entities changed in a session, in Session.info
+SESSION_CHANGES = "changes"
+
+def recordChange(session, persistent_entity, entity_id):
+    '''
+        Record the change of an entity in the session,
+        the changes are handled by the session listeners on commit.
+
+        :param sqlalchemy.orm.Session session: Session
+        :param persistent_entity: Persistent entity class or association table
+        :param int entity_id: Id of the changed entity, None for an association table
+    '''
+    session.info.setdefault(SESSION_CHANGES, []).append((persistent_entity, entity_id))
+
+# Session of the current thread, shared by all the DAOs
+_scope = local()
+
 class SessionDAO:
-    _session = None
+    '''
+        Access to the session of the current thread.
+        The session is shared by all the DAOs used in the same thread
+        and never by two threads, so the DAO singletons can be used
+        concurrently.
+    '''
+
+    @property
+    def _session(self):
+        return getattr(_scope, 'session', None)
+
+    @_session.setter
+    def _session(self, session):
+        _scope.session = session
 
     def getSession(self):
         '''
@@ -58,15 +141,50 @@ class SessionDAO:
 
             :param bool commit: True if I should commit the session
         '''
-        if commit:
-            self._session.commit()
-        self._session.close()
-        self._session = None
+        try:
+            if commit:
+                self._session.commit()
+        finally:
+            self._session.close()
+            self._session = None
+
 
+@contextmanager
+def unitOfWork():
+    '''
+        Run all the DAO calls in the block in a single transaction.
+
+        The session is opened on entering and shared by all the DAOs
+        used by the current thread in the block. It is committed when
+        the block ends and rolled back if it raises an exception.
+        A unit of work opened inside another one joins the outer one.
+
+        Example:
+            with unitOfWork():
+                tag = tagsDao.insert(name, metatag)
+                filesDao.addTag(file, tag)
+
+        :return: The session
+        :rtype: sqlalchemy.orm.Session
+    '''
+    dao = SessionDAO()
+    if dao.getSession() is not None:
+        yield dao.getSession()
+        return
+    session = dao.openSession()
+    try:
+        yield session
+    except BaseException:
+        session.rollback()
+        dao.closeSession()
+        raise
+    else:
+        dao.closeSession(commit=True)
 
 def withSession(method):
     '''
         Decorator: open and close a session.
+        The session of the current thread is used if already open.
     '''
     def newMethod(self, *args, **kwargs):
         # Open session
@@ -122,7 +240,11 @@ class EntityDAO(SessionDAO):
     _persistent_entity = None
     _entity = None
     _entity_lazy = None
+    # Loader options matching the relations read by _entity_lazy and _entity
     _options = None
+    _options_full = None
+    # Association tables whose rows are removed with the entity
+    _delete_cascade = ()
 
     @withSession
     @returnNonPersistent
@@ -146,7 +268,7 @@ class EntityDAO(SessionDAO):
             :return: Entity or None
             :rtype: entities.Common
         '''
-        entities = self._getBy(filters={'name': name})
+        entities = self._getBy(filters={'name': name}, options=self._options_full)
         if len(entities) == 0:
             return None
         else:
@@ -180,7 +302,45 @@ class EntityDAO(SessionDAO):
         '''
         return self._getBy(order=func.random(), limit=limit)
 
-    def _getBy(self, filters=None, order=None, offset=None, limit=None):
+    def iterAll(self, chunk_size=STREAM_CHUNK_SIZE):
+        '''
+            Iterate over all the entities sorted by name.
+
+            :param int chunk_size: Number of entities in each chunk
+            :return: Lists of non persistent entities
+            :rtype: generator of list of entities.Common
+        '''
+        def buildQuery(session):
+            query = session.query(self._persistent_entity)
+            query = self._withOptions(query, self._options)
+            return query.order_by(self._persistent_entity.name, self._persistent_entity.id)
+        return self._iterChunks(buildQuery, chunk_size)
+
+    def _iterChunks(self, build_query, chunk_size):
+        '''
+            Run a query in a dedicated session and convert the rows to
+            lazy entities a chunk at a time, while they are read from the cursor.
+            The session is closed when the iteration ends.
+
+            :param callable build_query: Function building the query from a session
+            :param int chunk_size: Number of entities in each chunk
+            :return: Lists of non persistent entities
+            :rtype: generator of list of entities.Common
+        '''
+        session = sessionMaker()
+        try:
+            chunk = []
+            for persistent in build_query(session).yield_per(chunk_size):
+                chunk.append(self._entity_lazy(persistent))
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            if len(chunk) > 0:
+                yield chunk
+        finally:
+            session.close()
+
+    def _getBy(self, filters=None, order=None, offset=None, limit=None, options=None):
         '''
             Get list of entities with the given filters.
 
@@ -188,12 +348,12 @@ class EntityDAO(SessionDAO):
             :param Persistent.Entity.key: Key used to sort
             :param int offset: Offset
             :param int limit: Limit
+            :param options: Loader options, default: the options of the lazy entity
             :return: List of persistent entities
             :rtype: list of entities.Persistent
         '''
         query = self._session.query(self._persistent_entity)
-        if self._options is not None:
-            query = query.options(self._options)
+        query = self._withOptions(query, self._options if options is None else options)
         if filters is not None:
             query = query.filter_by(**filters)
         if order is not None:
@@ -216,23 +376,39 @@ class EntityDAO(SessionDAO):
             :return: Non persistent entity with the given id or None
             :rtype: entities.Common
         '''
-        return self._getById(id)
+        return self._getById(id, options=self._options_full)
 
-    def _getById(self, id):
+    def _getById(self, id, options=None):
         '''
             Get an entity by id.
 
             :param int id: Id
+            :param options: Loader options
             :return: Persistent entity with the given id or None
             :rtype: entities.Persistent
         '''
         entity = None
         try:
-            entity = self._session.query(self._persistent_entity).filter_by(id=id).one()
+            query = self._withOptions(self._session.query(self._persistent_entity), options)
+            entity = query.filter_by(id=id).one()
         except exc.NoResultFound:
             entity = None
         return entity
 
+    def _withOptions(self, query, options):
+        '''
+            Add loader options to a query.
+
+            :param query: Query
+            :param options: Loader option or tuple of loader options
+            :return: The query with the options
+        '''
+        if options is None:
+            return query
+        if type(options) == tuple:
+            return query.options(*options)
+        return query.options(options)
+
     @withSession
     @returnNonPersistentFull
     def insert(self, **values):
@@ -246,7 +422,8 @@ class EntityDAO(SessionDAO):
         persistent = self._persistent_entity(**values)
         try:
             self._session.add(persistent)
-            self._session.commit()
+            self._session.flush()
+            recordChange(self._session, self._persistent_entity, persistent.id)
         except Exception:
             self._session.rollback()
             persistent = None
@@ -271,6 +448,7 @@ class EntityDAO(SessionDAO):
         persistent = self._getById(entity_id)
         for key, value in updates.items():
             setattr(persistent, key, value)
+        recordChange(self._session, self._persistent_entity, entity_id)
         return persistent
 
     @withSession
@@ -286,3 +464,6 @@ class EntityDAO(SessionDAO):
             entity_id = entity.id
         persistent = self._getById(entity_id)
         self._session.delete(persistent)
+        recordChange(self._session, self._persistent_entity, entity_id)
+        for table in self._delete_cascade:
+            recordChange(self._session, table, None)
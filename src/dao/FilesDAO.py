@@ -1,17 +1,29 @@
 #!/usr/bin/env python3
 
+from sqlalchemy import insert
+from sqlalchemy import or_
+from sqlalchemy import tuple_
 from sqlalchemy.orm import exc
+from sqlalchemy.orm import selectinload
 
 from .Common import EntityDAO
 from .Common import withSession
 from .Common import returnNonPersistent
 from .Common import returnNonPersistentFull
+from .Common import STREAM_CHUNK_SIZE
+from .Common import recordChange
+from .TagIndex import tagIndex
+from .Search import searchIndex
 
 from .entities.Persistent import File
 from .entities.Persistent import Tag
+from .entities.Persistent import file_tags
 from .entities.Common import IFile
 from .entities.Common import IFileLazy
 
+# Maximum number of ids bound in a single IN clause
+MAX_QUERY_IDS = 900
+
 class TagNotFound(Exception):
     pass
 
@@ -20,6 +32,8 @@ class FilesDAO(EntityDAO):
     _entity = IFile
     _entity_lazy = IFileLazy
     _persistent_entity = File
+    _options_full = selectinload(File.tags).joinedload(Tag.metatag)
+    _delete_cascade = (file_tags,)
 
     def insert(self, name=None, relpath=None, mime=None):
         return super().insert(name=name, relpath=relpath, mime=mime)
@@ -27,7 +41,7 @@ class FilesDAO(EntityDAO):
     @withSession
     @returnNonPersistentFull
     def getByName(self, name):
-        return self._getBy(filters={'name': name})
+        return self._getBy(filters={'name': name}, options=self._options_full)
 
     @withSession
     @returnNonPersistentFull
@@ -40,12 +54,31 @@ class FilesDAO(EntityDAO):
             :return: Entity or None
             :rtype: entities.Common
         '''
-        entities = self._getBy(filters={'name': name, 'relpath': relpath})
+        entities = self._getBy(filters={'name': name, 'relpath': relpath}, options=self._options_full)
         if len(entities) == 0:
             return None
         else:
             return entities[0]
 
+    @withSession
+    @returnNonPersistent
+    def getPageById(self, after_id=None, limit=None):
+        '''
+            Get the files sorted by id, starting after a given id.
+
+            :param int after_id: Id of the last file of the previous page
+            :param int limit: Limit
+            :return: List of files
+            :rtype: list of entities.Common.IFileLazy
+        '''
+        query = self._session.query(File)
+        if after_id is not None:
+            query = query.filter(File.id > after_id)
+        query = query.order_by(File.id)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
     @withSession
     @returnNonPersistentFull
     def addTag(self, file, tag):
@@ -58,9 +91,11 @@ class FilesDAO(EntityDAO):
             :rtype: entities.Common.IFile
         '''
         ptag = self._session.query(Tag).filter_by(id=tag.id).one()
-        pfile = self._getById(file.id)
+        pfile = self._getById(file.id, options=self._options_full)
         if not ptag in pfile.tags:
             pfile.tags.append(ptag)
+            tagIndex.addFileTag(self._session, pfile.id, ptag.id)
+            recordChange(self._session, file_tags, None)
         return pfile
 
     @withSession
@@ -75,37 +110,241 @@ class FilesDAO(EntityDAO):
             :rtype: entities.Common.IFile
         '''
         ptag = self._session.query(Tag).filter_by(id=tag.id).one()
-        pfile = self._getById(file.id)
+        pfile = self._getById(file.id, options=self._options_full)
         if ptag in pfile.tags:
             pfile.tags.remove(ptag)
+            tagIndex.removeFileTag(self._session, pfile.id, ptag.id)
+            recordChange(self._session, file_tags, None)
         return pfile
 
+    @withSession
+    def addTags(self, files, tags):
+        '''
+            Add all the given tags to all the given files.
+            The missing files and tags are skipped and all the
+            associations are written with a single INSERT OR IGNORE.
+
+            :param list files: Files or file ids
+            :param list tags: Tags or tag ids
+            :return: The ids of the files and of the tags found in the database
+            :rtype: set of int, set of int
+        '''
+        file_ids = self._getExistingIds(File, map(lambda file: self._getFileId(file), files))
+        tag_ids = self._getExistingIds(Tag, map(lambda tag: self._getTagId(tag), tags))
+        rows = []
+        for file_id in file_ids:
+            for tag_id in tag_ids:
+                rows.append({'File': file_id, 'Tag': tag_id})
+        if len(rows) > 0:
+            self._session.execute(insert(file_tags).prefix_with('OR IGNORE'), rows)
+            recordChange(self._session, file_tags, None)
+            for row in rows:
+                tagIndex.addFileTag(self._session, row['File'], row['Tag'])
+        return file_ids, tag_ids
+
     @withSession
     @returnNonPersistent
-    def getByNameAndTags(self, name=None, tags=None, offset=None, limit=None):
+    def getByFolders(self, relpaths):
+        '''
+            Get the files directly contained in some folders.
+
+            :param list of str relpaths: Paths of the folders relative to the root
+            :return: Files
+            :rtype: list of entities.Common.IFileLazy
+        '''
+        relpaths = list(set(relpaths))
+        files = []
+        for start in range(0, len(relpaths), MAX_QUERY_IDS):
+            chunk = relpaths[start:start + MAX_QUERY_IDS]
+            files.extend(self._session.query(File).filter(File.relpath.in_(chunk)))
+        return files
+
+    @withSession
+    @returnNonPersistent
+    def getByPaths(self, paths):
+        '''
+            Get the files with the given relpaths and names.
+
+            :param list of tuple paths: Relpath and name of each file
+            :return: Files found
+            :rtype: list of entities.Common.IFileLazy
+        '''
+        paths = list(set(paths))
+        files = []
+        # Each path binds two parameters
+        step = MAX_QUERY_IDS // 2
+        for start in range(0, len(paths), step):
+            chunk = paths[start:start + step]
+            files.extend(self._session.query(File).filter(tuple_(File.relpath, File.name).in_(chunk)))
+        return files
+
+    @withSession
+    @returnNonPersistent
+    def getInFolderTree(self, relpath):
+        '''
+            Get the files contained in a folder or in any of its subfolders.
+
+            :param str relpath: Path of the folder relative to the root
+            :return: Files
+            :rtype: list of entities.Common.IFileLazy
+        '''
+        query = self._session.query(File).filter(
+            or_(File.relpath == relpath, File.relpath.startswith(relpath + '/', autoescape=True)))
+        return query.all()
+
+    @withSession
+    def insertMany(self, files):
+        '''
+            Insert some files with a single INSERT OR IGNORE,
+            the files already in the database are skipped.
+
+            :param list of dict files: Name, relpath and mime of each file
+            :return: Id, relpath and name of the inserted files
+            :rtype: list of tuple
+        '''
+        if len(files) == 0:
+            return []
+        query = insert(File).prefix_with('OR IGNORE').returning(File.id, File.relpath, File.name)
+        inserted = list(map(tuple, self._session.execute(query, files)))
+        if len(inserted) > 0:
+            recordChange(self._session, File, None)
+        return inserted
+
+    def _getExistingIds(self, persistent_entity, ids):
+        '''
+            Get the ids, among the given ones, present in the database.
+
+            :param persistent_entity: Persistent entity class
+            :param iterable of int ids: Ids
+            :return: Ids present in the database
+            :rtype: set of int
+        '''
+        ids = list(set(ids))
+        existing = set()
+        for start in range(0, len(ids), MAX_QUERY_IDS):
+            chunk = ids[start:start + MAX_QUERY_IDS]
+            query = self._session.query(persistent_entity.id).filter(persistent_entity.id.in_(chunk))
+            existing.update(map(lambda row: row.id, query))
+        return existing
+
+    @withSession
+    def delete(self, file):
+        super().delete(file)
+        tagIndex.removeFile(self._session, self._getFileId(file))
+
+    @withSession
+    @returnNonPersistent
+    def getByNameAndTags(self, name=None, tags=None, offset=None, limit=None, after=None):
         '''
             Find all the files with a certain name and
             all the given tags.
+            The files are sorted by name and id, use after to
+            get the files following a given one (keyset pagination).
 
             :param str name: Name of the file
             :param list tags: List of tags
+            :param int offset: Offset
+            :param int limit: Limit
+            :param tuple after: Name and id of the last file of the previous page
             :return: All the files with given name and tags
             :rtype: list of entities.Common.IFile
         '''
-        query = self._session.query(File)
-        if name is not None:
-            query = query.filter(File.name.like(name))
-        if tags is not None:
-            for tag in tags:
-                ptag = Tag(id=self._getTagId(tag)) # self._session.query(Tag).filter_by(id=tag.id).one()
-                query = query.filter(File.tags.contains(ptag))
-        query = query.order_by(File.name)
+        if tags and tagIndex.isEnabled():
+            tag_ids = list(map(lambda tag: self._getTagId(tag), tags))
+            return self._getByNameAndTagIds(name, tag_ids, offset=offset, limit=limit, after=after)
+        query = self._queryByNameAndTags(self._session, name, tags, after)
         if offset is not None:
             query = query.offset(offset)
         if limit is not None:
             query = query.limit(limit)
         return query.all()
 
+    def iterByNameAndTags(self, name=None, tags=None, chunk_size=STREAM_CHUNK_SIZE):
+        '''
+            Iterate over all the files with a certain name and
+            all the given tags, sorted by name and id.
+
+            :param str name: Name of the file
+            :param list tags: List of tags
+            :param int chunk_size: Number of files in each chunk
+            :return: Lists of files
+            :rtype: generator of list of entities.Common.IFileLazy
+        '''
+        return self._iterChunks(lambda session: self._queryByNameAndTags(session, name, tags),
+                                chunk_size)
+
+    def _queryByNameAndTags(self, session, name=None, tags=None, after=None):
+        '''
+            Build the query of the files with a certain name and all
+            the given tags, sorted by name and id.
+
+            :param sqlalchemy.orm.Session session: Session
+            :param str name: Name of the file
+            :param list tags: List of tags
+            :param tuple after: Name and id of the last file of the previous page
+            :return: Query
+        '''
+        query = session.query(File)
+        if name is not None:
+            query = query.filter(searchIndex.fileNameLike(File, name))
+        if tags is not None:
+            for tag in tags:
+                ptag = Tag(id=self._getTagId(tag)) # self._session.query(Tag).filter_by(id=tag.id).one()
+                query = query.filter(File.tags.contains(ptag))
+        if after is not None:
+            after_name, after_id = after
+            query = query.filter(tuple_(File.name, File.id) > tuple_(after_name, after_id))
+        return query.order_by(File.name, File.id)
+
+    def _getByNameAndTagIds(self, name, tag_ids, offset=None, limit=None, after=None):
+        '''
+            Find the files with a certain name and all the given tags
+            using the tag index. Only the names of the candidate files and
+            the files in the requested page are read from the database.
+
+            :param str name: Name of the file
+            :param list of int tag_ids: List of tag ids
+            :param int offset: Offset
+            :param int limit: Limit
+            :param tuple after: Name and id of the last file of the previous page
+            :return: All the files with given name and tags
+            :rtype: list of entities.Persistent.File
+        '''
+        file_ids = list(tagIndex.getFiles(tag_ids))
+        if len(file_ids) == 0:
+            return []
+        # Sort the candidates by name
+        candidates = []
+        for start in range(0, len(file_ids), MAX_QUERY_IDS):
+            chunk = file_ids[start:start + MAX_QUERY_IDS]
+            query = self._session.query(File.id, File.name).filter(File.id.in_(chunk))
+            if name is not None:
+                query = query.filter(searchIndex.fileNameLike(File, name))
+            candidates.extend(query.all())
+        if after is not None:
+            after = tuple(after)
+            candidates = list(filter(lambda row: (row.name, row.id) > after, candidates))
+        candidates.sort(key=lambda row: (row.name, row.id))
+        # Select the page
+        start = 0 if offset is None else int(offset)
+        end = None if limit is None else start + int(limit)
+        page_ids = list(map(lambda row: row.id, candidates[start:end]))
+        # Load the files in the page
+        files = {}
+        for start in range(0, len(page_ids), MAX_QUERY_IDS):
+            chunk = page_ids[start:start + MAX_QUERY_IDS]
+            for pfile in self._session.query(File).filter(File.id.in_(chunk)):
+                files[pfile.id] = pfile
+        return list(map(lambda file_id: files[file_id], page_ids))
+
+    def _getFileId(self, file):
+        file_id = None
+        if type(file) == int:
+            file_id = file
+        else:
+            file_id = file.id
+        return file_id
+
     def _getTagId(self, tag):
         tag_id = None
         if type(tag) == int:
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+from sqlalchemy.orm import selectinload
+
 from .Common import EntityDAO
 from .Common import withSession
 
@@ -12,6 +14,7 @@ class MetatagsDAO(EntityDAO):
     _entity = IMetatag
     _entity_lazy = IMetatagLazy
     _persistent_entity = Metatag
+    _options_full = selectinload(Metatag.tags)
 
     def insert(self, name=None):
         return super().insert(name=name)
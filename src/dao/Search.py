@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import String
+from sqlalchemy import Table
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.Config import ConfigManager
+from src.Logging import createLogger
+
+# Full-text shadow tables, created by SearchIndex.setup
+metadata = MetaData()
+
+files_search = Table('FilesSearch', metadata,
+                     Column('rowid', Integer, primary_key=True),
+                     Column('name', String),
+                     Column('relpath', String)
+                    )
+
+tags_search = Table('TagsSearch', metadata,
+                    Column('rowid', Integer, primary_key=True),
+                    Column('name', String)
+                   )
+
+FILES_SEARCH_DDL = [
+    '''CREATE VIRTUAL TABLE FilesSearch USING fts5(
+           name, relpath, content='Files', content_rowid='id', tokenize='trigram')''',
+    '''CREATE TRIGGER IF NOT EXISTS FilesSearchInsert AFTER INSERT ON Files BEGIN
+           INSERT INTO FilesSearch(rowid, name, relpath) VALUES (new.id, new.name, new.relpath);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS FilesSearchDelete AFTER DELETE ON Files BEGIN
+           INSERT INTO FilesSearch(FilesSearch, rowid, name, relpath) VALUES ('delete', old.id, old.name, old.relpath);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS FilesSearchUpdate AFTER UPDATE OF name, relpath ON Files BEGIN
+           INSERT INTO FilesSearch(FilesSearch, rowid, name, relpath) VALUES ('delete', old.id, old.name, old.relpath);
+           INSERT INTO FilesSearch(rowid, name, relpath) VALUES (new.id, new.name, new.relpath);
+       END''',
+    '''INSERT INTO FilesSearch(FilesSearch) VALUES ('rebuild')'''
+]
+
+TAGS_SEARCH_DDL = [
+    '''CREATE VIRTUAL TABLE TagsSearch USING fts5(
+           name, content='Tags', content_rowid='id', tokenize='trigram')''',
+    '''CREATE TRIGGER IF NOT EXISTS TagsSearchInsert AFTER INSERT ON Tags BEGIN
+           INSERT INTO TagsSearch(rowid, name) VALUES (new.id, new.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS TagsSearchDelete AFTER DELETE ON Tags BEGIN
+           INSERT INTO TagsSearch(TagsSearch, rowid, name) VALUES ('delete', old.id, old.name);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS TagsSearchUpdate AFTER UPDATE OF name ON Tags BEGIN
+           INSERT INTO TagsSearch(TagsSearch, rowid, name) VALUES ('delete', old.id, old.name);
+           INSERT INTO TagsSearch(rowid, name) VALUES (new.id, new.name);
+       END''',
+    '''INSERT INTO TagsSearch(TagsSearch) VALUES ('rebuild')'''
+]
+
+
+class SearchIndex:
+    '''
+        Trigram full-text indices on the names of files and tags.
+
+        The FilesSearch and TagsSearch FTS5 tables mirror the Files and Tags
+        names and are kept in sync by triggers. A LIKE on a trigram table
+        uses the index for any pattern with at least three consecutive
+        characters, also when the pattern starts with a wildcard.
+        When FTS5 is not available the searches fall back to plain LIKE.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self):
+        self.available = False
+
+    def setup(self, engine):
+        '''
+            Create the search tables if missing.
+
+            :param sqlalchemy.engine.Engine engine: Engine
+        '''
+        if not ConfigManager.DB.getSearchIndex():
+            return
+        try:
+            with engine.begin() as connection:
+                self._createTable(connection, 'FilesSearch', FILES_SEARCH_DDL)
+                self._createTable(connection, 'TagsSearch', TAGS_SEARCH_DDL)
+        except OperationalError as e:
+            self.log.warning("Search index not available: %s" % e)
+            self.available = False
+        else:
+            self.available = True
+
+    def _createTable(self, connection, name, ddl):
+        query = text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name")
+        if connection.execute(query, {'name': name}).first() is not None:
+            return
+        self.log.info("Create search index %s" % name)
+        for statement in ddl:
+            connection.exec_driver_sql(statement)
+
+    def fileNameLike(self, file_entity, name_like):
+        '''
+            Filter the files with name matching a LIKE pattern.
+
+            :param file_entity: File persistent entity or alias
+            :param str name_like: LIKE pattern
+            :return: Filter clause
+        '''
+        if not self.available:
+            return file_entity.name.like(name_like)
+        matching = select(files_search.c.rowid).where(files_search.c.name.like(name_like))
+        return file_entity.id.in_(matching)
+
+    def tagNameLike(self, tag_entity, name_like):
+        '''
+            Filter the tags with name matching a LIKE pattern.
+
+            :param tag_entity: Tag persistent entity or alias
+            :param str name_like: LIKE pattern
+            :return: Filter clause
+        '''
+        if not self.available:
+            return tag_entity.name.like(name_like)
+        matching = select(tags_search.c.rowid).where(tags_search.c.name.like(name_like))
+        return tag_entity.id.in_(matching)
+
+
+searchIndex = SearchIndex()
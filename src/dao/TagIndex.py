@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+
+from threading import Lock
+
+try:
+    from pyroaring import BitMap
+except ImportError:
+    BitMap = set
+
+from sqlalchemy import event
+from sqlalchemy import select
+
+from src.Config import ConfigManager
+from src.Logging import createLogger
+
+from .ChangeVersions import changeVersions
+from .Common import engine
+from .Common import sessionMaker
+
+from .entities.Persistent import change_versions
+from .entities.Persistent import file_tags
+
+# Keys of the index changes made in a session and of the FileTags version
+# they lead to, in Session.info
+SESSION_INDEX_CHANGES = "tag-index-changes"
+SESSION_INDEX_VERSION = "tag-index-version"
+
+
+class TagIndex:
+    '''
+        In-memory inverted index: tag id -> ids of the files with the tag.
+        The file ids are stored in compressed bitmaps when pyroaring
+        is available, in plain sets otherwise.
+
+        The index is built from the FileTags table on first use and then
+        kept in sync by the DAO write methods: their changes are recorded
+        in the session and applied when it commits.
+        The index remembers the version of the FileTags table it matches
+        (see ChangeVersions) and is rebuilt when another process changes
+        the table.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self):
+        self._tags = None
+        self._version = None
+        self._lock = Lock()
+
+    def isEnabled(self):
+        '''
+            Check if the index is enabled in the configuration.
+
+            :rtype: bool
+        '''
+        return ConfigManager.DB.getTagIndex()
+
+    def _load(self):
+        '''
+            Build the index from the database, to be called with the lock held.
+            The version is read before the table so it is never newer
+            than the content of the index.
+        '''
+        self.log.debug("Building tag index")
+        tags = {}
+        with engine.connect() as connection:
+            version = self._getVersion(connection)
+            for tag_id, file_id in connection.execute(select(file_tags.c.Tag, file_tags.c.File)):
+                bitmap = tags.get(tag_id)
+                if bitmap is None:
+                    bitmap = BitMap()
+                    tags[tag_id] = bitmap
+                bitmap.add(file_id)
+        self._tags = tags
+        self._version = version
+        self.log.debug("Tag index built: %d tags" % len(tags))
+
+    def _getVersion(self, connection):
+        query = select(change_versions.c.version).where(change_versions.c.name == file_tags.name)
+        version = connection.execute(query).scalar()
+        return 0 if version is None else version
+
+    def clear(self):
+        '''
+            Drop the index, it will be rebuilt on the next search.
+        '''
+        with self._lock:
+            self._tags = None
+            self._version = None
+
+    def getFiles(self, tag_ids):
+        '''
+            Get the ids of the files with all the given tags.
+            The index is rebuilt if the FileTags table was changed
+            by another process.
+
+            :param list of int tag_ids: Tag ids
+            :return: Ids of the files with all the tags
+            :rtype: BitMap
+        '''
+        version = changeVersions.get([file_tags.name])[0].version
+        with self._lock:
+            if self._tags is not None and self._version != version:
+                self.log.debug("FileTags changed by another process")
+                self._tags = None
+            if self._tags is None:
+                self._load()
+            bitmaps = []
+            for tag_id in set(tag_ids):
+                bitmap = self._tags.get(tag_id)
+                if bitmap is None:
+                    return BitMap()
+                bitmaps.append(bitmap)
+            # Intersect starting from the smallest bitmap
+            bitmaps.sort(key=len)
+            result = BitMap(bitmaps[0])
+            for bitmap in bitmaps[1:]:
+                result &= bitmap
+                if len(result) == 0:
+                    break
+        return result
+
+    def _recordChange(self, session, method, *args):
+        '''
+            Record a change of the index in the session: it is applied
+            after the session commits and dropped if it rolls back.
+
+            :param sqlalchemy.orm.Session session: Session
+            :param callable method: Method of the index applying the change
+            :param args: Arguments of the method
+        '''
+        session.info.setdefault(SESSION_INDEX_CHANGES, []).append((method, args))
+
+    def _readVersion(self, session):
+        '''
+            Read the version of the FileTags table written by the
+            committing transaction, if the index is loaded.
+        '''
+        if self._tags is not None:
+            session.info[SESSION_INDEX_VERSION] = self._getVersion(session)
+
+    def _applyChanges(self, changes, version):
+        '''
+            Apply the changes of a committed session.
+
+            :param list of tuple changes: Method and arguments of each change
+            :param int version: Version of the FileTags table after the commit
+        '''
+        with self._lock:
+            if self._tags is None:
+                return
+            if version is None or self._version != version - 1:
+                # Missed the changes of another process, or of another
+                # thread committing concurrently
+                self._tags = None
+                self._version = None
+                return
+            for method, args in changes:
+                method(*args)
+            self._version = version
+
+    def addFileTag(self, session, file_id, tag_id):
+        self._recordChange(session, self._addFileTag, file_id, tag_id)
+
+    def removeFileTag(self, session, file_id, tag_id):
+        self._recordChange(session, self._removeFileTag, file_id, tag_id)
+
+    def removeFile(self, session, file_id):
+        self._recordChange(session, self._removeFile, file_id)
+
+    def removeTag(self, session, tag_id):
+        self._recordChange(session, self._removeTag, tag_id)
+
+    # Changes applied on commit, with the lock held
+
+    def _addFileTag(self, file_id, tag_id):
+        bitmap = self._tags.get(tag_id)
+        if bitmap is None:
+            bitmap = BitMap()
+            self._tags[tag_id] = bitmap
+        bitmap.add(file_id)
+
+    def _removeFileTag(self, file_id, tag_id):
+        bitmap = self._tags.get(tag_id)
+        if bitmap is not None:
+            bitmap.discard(file_id)
+
+    def _removeFile(self, file_id):
+        for bitmap in self._tags.values():
+            bitmap.discard(file_id)
+
+    def _removeTag(self, tag_id):
+        self._tags.pop(tag_id, None)
+
+
+tagIndex = TagIndex()
+
+
+def _onBeforeCommit(session):
+    if session.info.get(SESSION_INDEX_CHANGES):
+        tagIndex._readVersion(session)
+
+def _onCommit(session):
+    changes = session.info.pop(SESSION_INDEX_CHANGES, None)
+    version = session.info.pop(SESSION_INDEX_VERSION, None)
+    if changes:
+        tagIndex._applyChanges(changes, version)
+
+def _onRollback(session, previous_transaction):
+    session.info.pop(SESSION_INDEX_CHANGES, None)
+    session.info.pop(SESSION_INDEX_VERSION, None)
+
+
+# Registered after the listeners of ChangeVersions, which increment
+# the version read by _onBeforeCommit
+event.listen(sessionMaker, "before_commit", _onBeforeCommit)
+event.listen(sessionMaker, "after_commit", _onCommit)
+event.listen(sessionMaker, "after_soft_rollback", _onRollback)
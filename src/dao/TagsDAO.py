@@ -1,17 +1,22 @@
 #!/usr/bin/env python3
 
-from sqlalchemy.orm import aliased
+from sqlalchemy import select
 from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.expression import func
 
 from .Common import EntityDAO
 from .Common import withSession
 from .Common import returnNonPersistent
+from .TagIndex import tagIndex
+from .Search import searchIndex
 
 from .entities.Persistent import File
 from .entities.Persistent import Tag
 from .entities.Persistent import file_tags
 from .entities.Common import ITag
 from .entities.Common import ITagLazy
+from .entities.Common import ITagFacet
 from .entities.Common import IMetatag
 from .entities.Common import IMetatagLazy
 
@@ -22,6 +27,8 @@ class TagsDAO(EntityDAO):
     _entity_lazy = ITagLazy
     _persistent_entity = Tag
     _options = joinedload(Tag.metatag)
+    _options_full = (joinedload(Tag.metatag), selectinload(Tag.files))
+    _delete_cascade = (file_tags,)
 
     def insert(self, name=None, metatag=None):
         values = {}
@@ -38,6 +45,14 @@ class TagsDAO(EntityDAO):
             values['metatag_id'] = self._getMetatagId(metatag)
         return super().update(tag, **values)
 
+    @withSession
+    def delete(self, tag):
+        super().delete(tag)
+        if type(tag) == int:
+            tagIndex.removeTag(self._session, tag)
+        else:
+            tagIndex.removeTag(self._session, tag.id)
+
     def _getMetatagId(self, metatag):
         metatag_id = None
         if type(metatag) == int:
@@ -52,6 +67,7 @@ class TagsDAO(EntityDAO):
     @returnNonPersistent
     def getAllWithOneFileTagged(self):
         query = self._session.query(Tag).join(Tag.files).order_by(Tag.name)
+        query = query.options(self._options)
         return query.all()
 
     @withSession
@@ -62,6 +78,7 @@ class TagsDAO(EntityDAO):
         query = query.filter(Tag.files.contains(pfile))
         if metatag is not None:
             query = query.filter_by(metatag_id=metatag.id)
+        query = query.options(self._options)
         return query.all()
 
     @withSession
@@ -76,7 +93,7 @@ class TagsDAO(EntityDAO):
         '''
         query = self._session.query(Tag)
         if name is not None:
-            query = query.filter(Tag.name.like(name))
+            query = query.filter(searchIndex.tagNameLike(Tag, name))
         query = query.options(self._options)
         return query.all()
 
@@ -99,37 +116,52 @@ class TagsDAO(EntityDAO):
         return query.all()
 
     @withSession
-    @returnNonPersistent
     def getRelatedTags(self, tag_codes, name_like=None):
         '''
-            Find all the tags related with any of the given tags.
+            Find all the tags related with all of the given tags.
             A tag is related to another if there is at least one file with
             both tags.
+            Each tag is returned with the number of matching files it is
+            assigned to.
 
             :param tags: List of tag codes
             :param name_like: Part of a file name
-            :return: List of tags
-            :rtype: list of ITag
+            :return: List of tags with the files count
+            :rtype: list of ITagFacet
         '''
-        query = self._session.query(Tag).distinct()\
+        matching_files = self._getMatchingFiles(tag_codes, name_like)
+        files_count = func.count(file_tags.c.File)
+        query = self._session.query(Tag, files_count)\
             .join(file_tags, Tag.id == file_tags.c.Tag)
-        file_tag_aliases = {}
-        for tag_code in tag_codes:
-            alias = aliased(file_tags, name="TagFiles_%d" % tag_code)
-            query = query.join(alias, file_tags.c.File == alias.c.File)
-            file_tag_aliases[tag_code] = alias
-        if name_like:
-            file_alias = aliased(File, name="FileLike")
-            query = query.join(file_alias, file_tags.c.File == file_alias.id)
-        else:
-            file_alias = None
-        # Filter
-        for tag_code, alias in file_tag_aliases.items():
-            query = query.filter(alias.c.Tag == tag_code)
-        if file_alias is not None:
-            query = query.filter(file_alias.name.like(name_like))
+        if matching_files is not None:
+            query = query.filter(file_tags.c.File.in_(matching_files))
+        query = query.group_by(Tag.id).order_by(Tag.name)
         query = query.options(self._options)
-        return query.all()
+        return list(map(lambda row: ITagFacet(row[0], row[1]), query.all()))
+
+    def _getMatchingFiles(self, tag_codes, name_like=None):
+        '''
+            Build the query selecting the ids of the files with all the
+            given tags and a certain name.
 
+            :param tags: List of tag codes
+            :param name_like: Part of a file name
+            :return: Select of the file ids, None if there is no filter
+            :rtype: sqlalchemy.sql.Select
+        '''
+        tag_codes = set(tag_codes)
+        if len(tag_codes) > 0:
+            query = select(file_tags.c.File)\
+                .where(file_tags.c.Tag.in_(tag_codes))\
+                .group_by(file_tags.c.File)\
+                .having(func.count() == len(tag_codes))
+            if name_like:
+                query = query.join(File, File.id == file_tags.c.File)\
+                    .where(searchIndex.fileNameLike(File, name_like))
+        elif name_like:
+            query = select(File.id).where(searchIndex.fileNameLike(File, name_like))
+        else:
+            query = None
+        return query
 
 tagsDao = TagsDAO()
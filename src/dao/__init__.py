@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+from .Common import unitOfWork
 from .FilesDAO import filesDao
 from .TagsDAO import tagsDao
 from .MetatagsDAO import metatagsDao
+from .Catalog import catalog
+from .ChangeVersions import changeVersions
@@ -1,6 +1,44 @@
 #!/usr/bin/env python3
 
+from weakref import WeakValueDictionary
+
+# Shared instances of the lazy metatags and tags, by content
+_interned = WeakValueDictionary()
+
+def _intern(key, create):
+    '''
+        Get the shared instance with the given key, creating it if missing.
+
+        :param tuple key: Key identifying the content of the instance
+        :param callable create: Function creating the instance
+    '''
+    instance = _interned.get(key)
+    if instance is None:
+        instance = create()
+        _interned[key] = instance
+    return instance
+
+def internMetatag(persistent_entity):
+    '''
+        Get a shared IMetatagLazy of a persistent metatag.
+
+        :rtype: IMetatagLazy
+    '''
+    key = (IMetatagLazy, persistent_entity.id, persistent_entity.name)
+    return _intern(key, lambda: IMetatagLazy(persistent_entity))
+
+def internTag(persistent_entity):
+    '''
+        Get a shared ITagLazy of a persistent tag.
+
+        :rtype: ITagLazy
+    '''
+    pmetatag = persistent_entity.metatag
+    key = (ITagLazy, persistent_entity.id, persistent_entity.name, pmetatag.id, pmetatag.name)
+    return _intern(key, lambda: ITagLazy(persistent_entity))
+
 class Named:
+    __slots__ = ('id', 'name')
 
     def __init__(self, persistent_entity):
         self.id = persistent_entity.id
@@ -8,6 +46,7 @@ class Named:
 
 # File
 class IFileLazy(Named):
+    __slots__ = ('relpath', 'mime')
 
     def __init__(self, persistent_entity):
         super().__init__(persistent_entity)
@@ -15,19 +54,21 @@ class IFileLazy(Named):
         self.mime = persistent_entity.mime
 
 class IFile(IFileLazy):
+    __slots__ = ('tags',)
 
     def __init__(self, persistent_entity):
         super().__init__(persistent_entity)
         self.tags = []
         for ptag in persistent_entity.tags:
-            self.tags.append(ITagLazy(ptag))
+            self.tags.append(internTag(ptag))
 
 # Tag
 class ITagLazy(Named):
+    __slots__ = ('metatag', '__weakref__')
 
     def __init__(self, persistent_entity):
         super().__init__(persistent_entity)
-        self.metatag = IMetatagLazy(persistent_entity.metatag)
+        self.metatag = internMetatag(persistent_entity.metatag)
         '''
         self.metatag = None
         if persistent_entity.metatag is not None:
@@ -35,6 +76,7 @@ class ITagLazy(Named):
         '''
 
 class ITag(ITagLazy):
+    __slots__ = ('files',)
 
     def __init__(self, persistent_entity):
         super().__init__(persistent_entity)
@@ -43,13 +85,22 @@ class ITag(ITagLazy):
         for pfile in persistent_entity.files:
             self.files.append(IFileLazy(pfile))
 
+class ITagFacet(ITagLazy):
+    __slots__ = ('count',)
+
+    def __init__(self, persistent_entity, count):
+        super().__init__(persistent_entity)
+        self.count = count
+
 # Metatag
 class IMetatagLazy(Named):
+    __slots__ = ('__weakref__',)
 
     def __init__(self, persistent_entity):
         super().__init__(persistent_entity)
 
 class IMetatag(IMetatagLazy):
+    __slots__ = ('tags',)
 
     def __init__(self, persistent_entity):
         super().__init__(persistent_entity)
@@ -59,6 +110,7 @@ class IMetatag(IMetatagLazy):
 
 # System File
 class SystemFile():
+    __slots__ = ('src', 'name')
 
     def __init__(self, src, name):
         self.src = src
@@ -6,6 +6,7 @@ Base = declarative_base()
 from sqlalchemy import Table
 
 from sqlalchemy import Column
+from sqlalchemy import Float
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy import ForeignKey
@@ -18,6 +19,13 @@ file_tags = Table('FileTags', Base.metadata,
                   Column('Tag', ForeignKey('Tags.id'), primary_key=True)
                  )
 
+# Version of each table, incremented by every transaction changing it
+change_versions = Table('ChangeVersions', Base.metadata,
+                        Column('name', String, primary_key=True),
+                        Column('version', Integer, nullable=False),
+                        Column('modified', Float, nullable=False)
+                       )
+
 # Entities
 class File(Base):
     __tablename__ = "Files"
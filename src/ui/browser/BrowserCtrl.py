@@ -6,9 +6,9 @@ from src.Logging import createLogger
 from src.ui.common import ensureLoading
 from src.ui.common import BaseController
 
-from src.dao import metatagsDao
 from src.dao import tagsDao
 from src.dao import filesDao
+from src.dao import catalog
 
 from src import System
 
@@ -48,8 +48,8 @@ class BrowserCtrl(BaseController):
         self.ui.show()
 
     def load(self):
-        self.metatags = metatagsDao.getAll()
-        self.tags = tagsDao.getAll()
+        self.metatags_version, self.metatags = catalog.getMetatags()
+        self.tags_version, self.tags = catalog.getTags()
         self.used_tags = []
         self.name_filter = None
         self.files = self._getFiles(self.used_tags)
@@ -71,12 +71,12 @@ class BrowserCtrl(BaseController):
             given files.
 
             :param list of IFile files: Files
-            :return: list of tags
-            :rtype: list of dao.entities.Common.ITag
+            :return: list of tags with the matching files count
+            :rtype: list of dao.entities.Common.ITagFacet
         '''
         if len(self.used_tags) == 0 and not self.name_filter:
             # Get all the tags with at least one file tagged
-            return tagsDao.getAllWithOneFileTagged()
+            return tagsDao.getRelatedTags([])
         # Get the common tags
         used_ids = list(map(lambda t: t.id, self.used_tags))
         if self.name_filter is not None:
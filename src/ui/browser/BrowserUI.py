@@ -4,9 +4,11 @@ import os
 
 from gi.repository import Gtk
 from gi.repository import Gdk
+from gi.repository import GLib
 from gi.repository.GObject import GType
 from gi.repository.GdkPixbuf import Pixbuf
 
+from src.Cache import LRUCache
 from src.Logging import createLogger
 from src.Config import ConfigManager
 from src.Places import GLADE_FOLDER
@@ -15,13 +17,21 @@ from src.ui.common import BaseInterface
 from src.ui.Utils import inhibitSignals
 from src.ui.Utils import withInhibit
 from src.System import openFile
+from src.System import thumbnailer
+from src.System import thumbnailScheduler
 
 from .menu import FilesViewMenu
+from .ThumbnailLoader import ThumbnailLoader
 
 ICON_SIZE = 256
 
 FILES_LIMIT = 100
 
+# Rows considered visible before the files view is drawn
+VISIBLE_FALLBACK = 40
+
+MB = 1024 * 1024
+
 PIXBUF_MISSING = Gtk.IconTheme.get_default().load_icon(Gtk.STOCK_MISSING_IMAGE, ICON_SIZE, 0)
 
 class BrowserUI(BaseInterface):
@@ -109,6 +119,17 @@ class BrowserUI(BaseInterface):
         files_view.set_text_column(1)
         files_view.set_pixbuf_column(2)
         files_view.set_model(self.files_store)
+        # Load the thumbnails of the visible files in background
+        self.files_rows = {}
+        self.files_loaded = set()
+        self.thumbnail_loader = ThumbnailLoader(self._loadThumbnail, self._setThumbnail)
+        # Cache the decoded thumbnails and mime icons
+        pixbufSize = lambda pixbuf: pixbuf.get_byte_length()
+        self.thumbnail_cache = LRUCache(ConfigManager.UI.getThumbnailCacheSize() * MB, sizeof=pixbufSize)
+        self.mime_cache = LRUCache(ConfigManager.UI.getIconCacheSize() * MB, sizeof=pixbufSize)
+        adjustment = self.builder.get_object('FilesViewScroll').get_vadjustment()
+        adjustment.connect("value-changed", self.onFilesViewScroll)
+        adjustment.connect("changed", self.onFilesViewScroll)
 
     def _registerEvents(self):
         '''
@@ -179,24 +200,32 @@ class BrowserUI(BaseInterface):
         tags_list = self.builder.get_object("TagsList")
         for child in tags_list.get_children():
             child.hide()
-        # Show available tags
+        # Show available tags with the files count
         for tag in self.ctrl.available_tags:
-            self.tags_buttons[tag.id].show()
+            btn = self.tags_buttons[tag.id]
+            btn.set_label("%s (%d)" % (tag.name, tag.count))
+            btn.show()
         # Filter
         self.filterTagsList()
 
     def updateFilesList(self, append=False):
         if not append:
+            self.thumbnail_loader.cancel()
             self.files_store.clear()
+            self.files_rows = {}
+            self.files_loaded = set()
         max_files = len(self.ctrl.files)
         max_index = min(len(self.files_store) + self.files_limit, max_files)
         for i in range(len(self.files_store), max_index):
             file = self.ctrl.files[i]
-            pixbuf = self._getFilePixbuf(file)
+            # Show the mime icon until the thumbnail is loaded
+            pixbuf = self._getMimePixbuf(file.mime)
             relpath = os.path.join(file.relpath, file.name)
+            self.files_rows[file.id] = len(self.files_store)
             self.files_store.append([file.id, file.name, pixbuf, relpath])
         files_view = self.builder.get_object('FilesView')
         files_view.show_all()
+        GLib.idle_add(self._requestVisibleThumbnails)
         # Show/hide the load more files button
         btn = self.builder.get_object("LoadMoreFiles")
         if len(self.files_store) == max_files:
@@ -241,29 +270,126 @@ class BrowserUI(BaseInterface):
             btn.connect("activate-link", activate_function, tag)
         return btn
 
-    def _getFilePixbuf(self, file):
+    def _getThumbnailPath(self, file):
         '''
-            Get the pixbuf for a file. Try to use the thumbnail if possible,
-            fallback to the mime icon.
+            Get the path of the thumbnail of a file.
 
             :param dao.entities.Common.IFile file: File
-            :return: Pixbuf for the file
-            :rtype: GdkPixbuf.Pixbuf
+            :return: Path of the thumbnail (may not exist on filesystem)
+            :rtype: str
         '''
         icon_name = "thumbnails/%d/%d.png" % (ICON_SIZE, file.id)
-        icon_path = os.path.join(ConfigManager.profile_folder, icon_name)
+        return os.path.join(ConfigManager.profile_folder, icon_name)
+
+    def _loadThumbnail(self, file):
+        '''
+            Load the thumbnail of a file and schedule its creation
+            if it is missing or stale.
+            Called in the thumbnail loader thread.
+
+            :param dao.entities.Common.IFile file: File
+            :return: Pixbuf of the thumbnail, None if not available
+            :rtype: GdkPixbuf.Pixbuf
+        '''
+        icon_path = self._getThumbnailPath(file)
         pixbuf = None
-        # Try to load the thumbnail
-        if os.path.exists(icon_path):
-            try:
-                pixbuf = Pixbuf.new_from_file(icon_path)
-            except Exception:
-                pixbuf = None
-        # Use the mime icon
-        if pixbuf is None:
-            pixbuf = self._getMimePixbuf(file.mime)
+        # Try to load the thumbnail, use the cached one if not modified
+        try:
+            mtime = os.stat(icon_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None:
+            key = (file.id, ICON_SIZE, mtime)
+            pixbuf = self.thumbnail_cache.get(key)
+            if pixbuf is None:
+                try:
+                    pixbuf = Pixbuf.new_from_file(icon_path)
+                except Exception:
+                    pixbuf = None
+                else:
+                    self.thumbnail_cache.put(key, pixbuf)
+        # Create the thumbnail if missing or stale
+        if thumbnailer.needsThumbnail(file):
+            self._scheduleThumbnail(file)
         return pixbuf
 
+    def _setThumbnail(self, file, pixbuf):
+        '''
+            Replace the icon of a file with its thumbnail.
+            Called in the main loop.
+
+            :param dao.entities.Common.IFile file: File
+            :param GdkPixbuf.Pixbuf pixbuf: Thumbnail, None if not available
+        '''
+        index = self.files_rows.get(file.id)
+        if index is None:
+            # The file is no longer in the view
+            return
+        self.files_loaded.add(file.id)
+        if pixbuf is not None:
+            self.files_store[index][2] = pixbuf
+
+    def _requestVisibleThumbnails(self):
+        '''
+            Request the thumbnails of the visible files and cancel
+            the requests of the files scrolled out of view.
+        '''
+        keep = set()
+        requests = []
+        for index in self._getVisibleRows():
+            file = self.ctrl.files[index]
+            keep.add(file.id)
+            if file.id not in self.files_loaded:
+                requests.append(file)
+        self.thumbnail_loader.cancel(keep)
+        for file in requests:
+            self.thumbnail_loader.request(file)
+        return False
+
+    def _getVisibleRows(self):
+        '''
+            Get the indices of the rows visible in the files view.
+            Before the view is drawn the first rows are returned.
+
+            :return: Indices of the visible rows
+            :rtype: range
+        '''
+        count = len(self.files_store)
+        files_view = self.builder.get_object('FilesView')
+        visible_range = files_view.get_visible_range()
+        start_path, end_path = None, None
+        if visible_range:
+            start_path, end_path = visible_range[-2:]
+        if start_path is None or end_path is None:
+            return range(0, min(count, VISIBLE_FALLBACK))
+        start = start_path.get_indices()[0]
+        end = end_path.get_indices()[0]
+        return range(start, min(end + 1, count))
+
+    def _scheduleThumbnail(self, file):
+        '''
+            Create the thumbnail of a file in background.
+            The file icon is updated when the thumbnail is ready.
+
+            :param dao.entities.Common.IFile file: File
+        '''
+        if thumbnailer.getMimeThumbnailType(file.mime) is None:
+            return
+        callback = lambda future: GLib.idle_add(self._onThumbnailCreated, file, future)
+        thumbnailScheduler.schedule(file, callback=callback, block=False)
+
+    def _onThumbnailCreated(self, file, future):
+        '''
+            Load the new thumbnail of a file still in the view.
+            Called in the main loop.
+        '''
+        if future.cancelled() or future.exception() is not None or future.result() is None:
+            return False
+        if file.id in self.files_rows:
+            self.files_loaded.discard(file.id)
+            self.thumbnail_loader.request(file)
+        return False
+
     def _getMimePixbuf(self, mime):
         '''
             Get the icon pixbuf representing a mime.
@@ -272,6 +398,9 @@ class BrowserUI(BaseInterface):
             :return: Pixbuf for the mime
             :rtype: GdkPixbuf.Pixbuf
         '''
+        pixbuf = self.mime_cache.get(mime)
+        if pixbuf is not None:
+            return pixbuf
         # Get the icon name
         theme = Gtk.IconTheme.get_default()
         name = None
@@ -284,6 +413,8 @@ class BrowserUI(BaseInterface):
             pixbuf = theme.load_icon(name, ICON_SIZE, 0)
         except Exception:
             pixbuf = None
+        else:
+            self.mime_cache.put(mime, pixbuf)
         return pixbuf
 
     def _generateGtkIconNames(self, mime):
@@ -425,6 +556,9 @@ class BrowserUI(BaseInterface):
         self.files_limit += FILES_LIMIT
         self.updateFilesList(append=True)
 
+    def onFilesViewScroll(self, adjustment):
+        self._requestVisibleThumbnails()
+
     def onFileClick(self, icon, treepath):
         findex = int(treepath.to_string())
         relpath = self.files_store[findex][-1]
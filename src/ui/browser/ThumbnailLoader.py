@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+from collections import OrderedDict
+from threading import Condition
+from threading import Thread
+
+from gi.repository import GLib
+
+from src.Logging import createLogger
+
+
+class ThumbnailLoader:
+    '''
+        Load the thumbnails of the files in a background thread.
+
+        load is called in the worker thread with the file and returns
+        the pixbuf (or None), deliver is called in the main loop with the
+        file and the result of load. Requests not yet started can be cancelled.
+    '''
+
+    log = createLogger(__name__)
+
+    def __init__(self, load, deliver):
+        self.load = load
+        self.deliver = deliver
+        self._pending = OrderedDict()
+        self._condition = Condition()
+        self._thread = Thread(target=self._work, name="thumbnail-loader", daemon=True)
+        self._thread.start()
+
+    def request(self, file):
+        '''
+            Request the thumbnail of a file.
+
+            :param dao.entities.Common.IFileLazy file: File
+        '''
+        with self._condition:
+            self._pending[file.id] = file
+            self._condition.notify()
+
+    def cancel(self, keep=None):
+        '''
+            Cancel the pending requests.
+
+            :param set of int keep: Ids of the files whose request should be kept
+        '''
+        with self._condition:
+            if keep is None:
+                self._pending.clear()
+                return
+            for file_id in list(self._pending.keys()):
+                if file_id not in keep:
+                    del self._pending[file_id]
+
+    def isPending(self, file_id):
+        with self._condition:
+            return file_id in self._pending
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while len(self._pending) == 0:
+                    self._condition.wait()
+                _, file = self._pending.popitem(last=False)
+            try:
+                pixbuf = self.load(file)
+            except Exception as e:
+                self.log.warning("Cannot load thumbnail of %s: %s" % (file.name, e))
+                pixbuf = None
+            GLib.idle_add(self._deliver, file, pixbuf)
+
+    def _deliver(self, file, pixbuf):
+        self.deliver(file, pixbuf)
+        return False
@@ -7,6 +7,7 @@ from src.ui.common import BaseController
 
 from src.dao import metatagsDao
 from src.dao import tagsDao
+from src.dao import catalog
 
 from .EditorUI import EditorUI
 
@@ -29,8 +30,8 @@ class EditorCtrl(BaseController):
         self.ui.close()
 
     def load(self):
-        self.metatags = metatagsDao.getAll()
-        self.tags = tagsDao.getAll()
+        self.metatags_version, self.metatags = catalog.getMetatags()
+        self.tags_version, self.tags = catalog.getTags()
 
     def setupUpdateEvents(self):
         super().setupUpdateEvents()
@@ -38,12 +39,18 @@ class EditorCtrl(BaseController):
         self.on_update[UPDATE_TAGS] = []
 
     def _updateTags(self):
-        self.tags = tagsDao.getAll()
-        self.trigger(UPDATE_TAGS)
+        delta = catalog.getTagsSince(self.tags_version)
+        self.tags = delta.apply(self.tags)
+        self.tags_version = delta.version
+        if not delta.isEmpty():
+            self.trigger(UPDATE_TAGS)
 
     def _updateMetatags(self):
-        self.metatags = metatagsDao.getAll()
-        self.trigger(UPDATE_METATAGS)
+        delta = catalog.getMetatagsSince(self.metatags_version)
+        self.metatags = delta.apply(self.metatags)
+        self.metatags_version = delta.version
+        if not delta.isEmpty():
+            self.trigger(UPDATE_METATAGS)
 
     # Public methods
     def addTag(self, name, metatag):
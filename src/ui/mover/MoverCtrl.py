@@ -12,6 +12,7 @@ from src.Utils import loadModuleFromPath
 from src.dao import filesDao
 from src.dao import tagsDao
 from src.dao import metatagsDao
+from src.dao import unitOfWork
 
 from src.ui.common import ensureLoading
 from src.ui.common import BaseController
@@ -136,18 +137,15 @@ class MoverCtrl(BaseController):
         file = addFile(path)
         self.log.info("Added file #%d, name: %s, mime: %s" % (file.id, file.name, file.mime))
         # Apply tags
-        session = tagsDao.openSession()
-        filesDao.setSession(session)
-        for tag_info in tags:
-            name, metatag = tag_info
-            self.log.info("Add tag %s" % name)
-            tag = tagsDao.getByName(name)
-            if tag is None:
-                self.log.info("Create tag %s [%s]" % (name, metatag.name))
-                tag = tagsDao.insert(name, metatag)
-            file = filesDao.addTag(file, tag)
-        tagsDao.closeSession(commit=True)
-        filesDao.closeSession(commit=True)
+        with unitOfWork():
+            for tag_info in tags:
+                name, metatag = tag_info
+                self.log.info("Add tag %s" % name)
+                tag = tagsDao.getByName(name)
+                if tag is None:
+                    self.log.info("Create tag %s [%s]" % (name, metatag.name))
+                    tag = tagsDao.insert(name, metatag)
+                file = filesDao.addTag(file, tag)
         # Open file
         if ConfigManager.UI.getMoverOpenOnTag():
             folder = os.path.join(file.relpath, file.name)
@@ -10,6 +10,7 @@ from src.ui.common import BaseController
 from src.dao import metatagsDao
 from src.dao import tagsDao
 from src.dao import filesDao
+from src.dao import catalog
 
 UPDATE_METATAGS = 0
 UPDATE_TAGS = 1
@@ -60,8 +61,8 @@ class TaggerCtrl(BaseController):
         # TODO
 
     def load(self):
-        self.metatags = metatagsDao.getAll()
-        self.tags = tagsDao.getAll()
+        self.metatags_version, self.metatags = catalog.getMetatags()
+        self.tags_version, self.tags = catalog.getTags()
 
     def fileHasTag(self, tag_id):
         '''
@@ -94,13 +95,17 @@ class TaggerCtrl(BaseController):
 
     def createMetatag(self, name):
         metatag = metatagsDao.insert(name)
-        self.metatags = metatagsDao.getAll()
+        delta = catalog.getMetatagsSince(self.metatags_version)
+        self.metatags = delta.apply(self.metatags)
+        self.metatags_version = delta.version
         self.trigger(UPDATE_METATAGS)
         return metatag
 
     def createTag(self, name, metatag):
         tag = tagsDao.insert(name, metatag)
-        self.tags = tagsDao.getAll()
+        delta = catalog.getTagsSince(self.tags_version)
+        self.tags = delta.apply(self.tags)
+        self.tags_version = delta.version
         self.trigger(UPDATE_TAGS)
         return tag
 
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+from flask import Flask
+from flask_restful import Api
+
+from src.web.resources import Files
+from src.web.resources import Tags
+from src.web.resources import Metatags
+from src.web.resources import FileTags
+from src.web.resources import FileList
+from src.web.resources import BulkFileTags
+from src.web.resources import CacheStats
+
+from src.Application import API_VERSION
+
+API_PREFIX = '/api/' + API_VERSION
+
+
+def createApp():
+    '''
+        Create the Flask application with the API resources.
+
+        :rtype: flask.Flask
+    '''
+    app = Flask(__name__)
+    api = Api(app)
+    api.add_resource(Files,
+                     API_PREFIX + '/files',
+                     API_PREFIX + '/files/<int:eid>')
+    api.add_resource(Tags,
+                     API_PREFIX + '/tags',
+                     API_PREFIX + '/tags/<int:eid>')
+    api.add_resource(Metatags,
+                     API_PREFIX + '/metatags',
+                     API_PREFIX + '/metatags/<int:eid>')
+    api.add_resource(FileTags,
+                     API_PREFIX + '/files/<int:fid>/tags',
+                     API_PREFIX + '/files/<int:fid>/tags/<int:tid>',)
+    api.add_resource(BulkFileTags,
+                     API_PREFIX + '/files/tags')
+    api.add_resource(FileList,
+                     API_PREFIX + '/files/<int:fid>/list',)
+    api.add_resource(CacheStats,
+                     API_PREFIX + '/cache')
+    return app
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+from src.Cache import LRUCache
+from src.Config import ConfigManager
+from src.dao import changeVersions
+
+
+class ResponseCache:
+    '''
+        Cache of the serialised lists returned by the resources,
+        in the memory of the process.
+
+        The key contains the versions of the tables the list is read
+        from, so a list is never returned after a change of the tables,
+        also when the change is made by another process.
+        The lists reading the tables changed by this process are
+        evicted right after the commit.
+    '''
+
+    def __init__(self, max_size, ttl):
+        '''
+            Initialize.
+
+            :param int max_size: Maximum number of lists, 0 to disable the cache
+            :param float ttl: Seconds a list is kept
+        '''
+        self.cache = LRUCache(max_size, ttl=ttl) if max_size > 0 else None
+
+    def isEnabled(self):
+        return self.cache is not None
+
+    def createKey(self, resource, args, versions):
+        '''
+            Create the key of a list.
+            The order of the parameters and of their values is ignored.
+
+            :param str resource: Name of the resource
+            :param werkzeug.datastructures.MultiDict args: Query parameters
+            :param list of TableVersion versions: Versions of the tables the list is read from
+            :return: Key
+            :rtype: tuple
+        '''
+        params = tuple(sorted(map(lambda key: (key, tuple(sorted(args.getlist(key)))), args.keys())))
+        tables = tuple(map(lambda version: (version.name, version.version), versions))
+        return resource, params, tables
+
+    def get(self, key):
+        '''
+            Get a cached list.
+
+            :param tuple key: Key created with createKey
+            :return: Serialised list, None if not cached
+        '''
+        return self.cache.get(key)
+
+    def put(self, key, data):
+        '''
+            Cache a list.
+
+            :param tuple key: Key created with createKey
+            :param data: Serialised list
+        '''
+        self.cache.put(key, data)
+
+    def invalidate(self, names):
+        '''
+            Remove the lists reading any of the given tables.
+
+            :param set of str names: Names of the changed tables
+        '''
+        if self.cache is None:
+            return
+        self.cache.removeIf(lambda key: any(map(lambda table: table[0] in names, key[2])))
+
+    def getStats(self):
+        '''
+            Get the usage of the cache in this process.
+
+            :rtype: dict
+        '''
+        if self.cache is None:
+            return {'enabled': False, 'entries': 0, 'max_size': 0,
+                    'ttl': None, 'hits': 0, 'misses': 0}
+        return {
+            'enabled': True,
+            'entries': len(self.cache),
+            'max_size': self.cache.max_size,
+            'ttl': self.cache.ttl,
+            'hits': self.cache.hits,
+            'misses': self.cache.misses,
+        }
+
+
+responseCache = ResponseCache(ConfigManager.SERVER.getResponseCacheSize(),
+                              ConfigManager.SERVER.getResponseCacheTTL())
+changeVersions.addListener(responseCache.invalidate)
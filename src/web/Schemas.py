@@ -14,6 +14,9 @@ class MetatagLazySchema(NamedSchema):
 class TagLazySchema(NamedSchema):
     metatag = fields.Nested(MetatagLazySchema)
 
+class TagFacetSchema(TagLazySchema):
+    count = fields.Int()
+
 class FileLazySchema(NamedSchema):
     relpath = fields.Str()
     mime = fields.Str()
@@ -28,6 +31,28 @@ class TagSchema(TagLazySchema):
 class FileSchema(FileLazySchema):
     tags = fields.List(fields.Nested(TagLazySchema))
 
+# Bulk tagging
+class BulkTagsSchema(Schema):
+    files = fields.List(fields.Int(), required=True)
+    tags = fields.List(fields.Int(), required=True)
+
+class ItemResultSchema(Schema):
+    id = fields.Int()
+    status = fields.Str()
+
+class BulkTagsResultSchema(Schema):
+    files = fields.List(fields.Nested(ItemResultSchema))
+    tags = fields.List(fields.Nested(ItemResultSchema))
+
+# Response cache
+class CacheStatsSchema(Schema):
+    enabled = fields.Bool()
+    entries = fields.Int()
+    max_size = fields.Int()
+    ttl = fields.Float(allow_none=True)
+    hits = fields.Int()
+    misses = fields.Int()
+
 class BasicErrorSchema(Schema):
     code = fields.Int()
     message = fields.Str()
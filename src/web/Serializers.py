@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+from marshmallow import fields
+
+from src.web.Schemas import NamedSchema
+from src.web.Schemas import MetatagLazySchema
+from src.web.Schemas import TagLazySchema
+from src.web.Schemas import TagFacetSchema
+from src.web.Schemas import FileLazySchema
+from src.web.Schemas import MetatagSchema
+from src.web.Schemas import TagSchema
+from src.web.Schemas import FileSchema
+
+# Schemas of the entities, serialized with SchemaSerializer
+COMPILED_SCHEMAS = (NamedSchema, MetatagLazySchema, TagLazySchema, TagFacetSchema,
+                    FileLazySchema, MetatagSchema, TagSchema, FileSchema)
+
+MISSING = object()
+
+
+class UnsupportedSchema(Exception):
+    pass
+
+
+class SchemaSerializer:
+    '''
+        Serializer equivalent to the dump of a marshmallow schema made of
+        Int, Str, Nested and List fields, compiled once to a list of
+        attribute readers and converters.
+
+        As in marshmallow the attributes missing from an object are
+        skipped and the None values are kept. The objects are read
+        by attribute only, like the non persistent entities.
+    '''
+
+    def __init__(self, schema):
+        '''
+            Compile a schema.
+
+            :param marshmallow.Schema schema: Schema
+            :raises UnsupportedSchema: If the schema has fields or hooks not supported
+        '''
+        if any(map(lambda hooks: len(hooks) > 0, schema._hooks.values())):
+            raise UnsupportedSchema("%s has processing hooks" % type(schema).__name__)
+        self.many = schema.many
+        self.fields = []
+        for name, field in schema.dump_fields.items():
+            attribute = field.attribute or name
+            key = field.data_key or name
+            self.fields.append((key, attribute, compileField(field)))
+
+    def dump(self, data):
+        '''
+            Serialize an object or a list of objects.
+
+            :param data: Object or list of objects, as expected by the schema
+            :return: Serialized data
+            :rtype: dict or list of dict
+        '''
+        if self.many:
+            return list(map(self.dumpOne, data))
+        return self.dumpOne(data)
+
+    def dumpOne(self, obj):
+        result = {}
+        for key, attribute, convert in self.fields:
+            value = getattr(obj, attribute, MISSING)
+            if value is MISSING:
+                continue
+            if value is None:
+                result[key] = None
+            else:
+                result[key] = convert(value)
+        return result
+
+
+def compileField(field):
+    '''
+        Get the function converting a non None value of a field.
+
+        :param marshmallow.fields.Field field: Field
+        :return: Converter
+        :rtype: callable
+    '''
+    if type(field) == fields.Int:
+        return int
+    if type(field) == fields.Str:
+        return str
+    if type(field) == fields.Nested:
+        return SchemaSerializer(field.schema).dump
+    if type(field) == fields.List:
+        inner = compileField(field.inner)
+        return lambda values: [None if value is None else inner(value) for value in values]
+    raise UnsupportedSchema("Field %s not supported" % type(field).__name__)
+
+
+_serializers = {}
+
+def getSerializer(schema):
+    '''
+        Get the compiled serializer of a schema instance.
+
+        :param marshmallow.Schema schema: Schema
+        :return: Serializer, None if the schema is not an entity schema
+        :rtype: SchemaSerializer
+    '''
+    key = id(schema)
+    if key in _serializers:
+        return _serializers[key][1]
+    serializer = None
+    if type(schema) in COMPILED_SCHEMAS:
+        serializer = SchemaSerializer(schema)
+    # Keep a reference to the schema so the id is not reused
+    _serializers[key] = (schema, serializer)
+    return serializer
+
+def dump(data, schema):
+    '''
+        Serialize data with a schema, with the compiled
+        serializer when possible.
+
+        :param data: Data
+        :param marshmallow.Schema schema: Schema
+        :return: Serialized data
+    '''
+    serializer = getSerializer(schema)
+    if serializer is None:
+        return schema.dump(data)
+    return serializer.dump(data)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from threading import Thread
+
+from werkzeug.serving import BaseWSGIServer
+
+from src.Logging import createLogger
+from src.dao.Common import disposeAfterFork
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+MODE_DEVELOPMENT = "development"
+MODE_PRODUCTION = "production"
+
+# Seconds after the start in which a failing worker stops the server
+WORKER_BOOT_TIME = 1
+
+log = createLogger(__name__)
+
+
+if BaseApplication is not None:
+
+    class GunicornApplication(BaseApplication):
+        '''
+            Embedded gunicorn server with the given options.
+        '''
+
+        def __init__(self, app, options):
+            self.application = app
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    '''
+        Werkzeug WSGI server handling the connections
+        in a fixed pool of threads.
+        A connection is accepted only when a thread is free to serve it,
+        so the pending connections are left to the other workers
+        sharing the socket.
+        Werkzeug closes the connection after each response.
+    '''
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+        self._slots = BoundedSemaphore(threads)
+        super().__init__(host, port, app, fd=fd)
+
+    def get_request(self):
+        self._slots.acquire()
+        try:
+            return super().get_request()
+        except BaseException:
+            # e.g. the connection was accepted by another worker
+            self._slots.release()
+            raise
+
+    def process_request(self, request, client_address):
+        try:
+            self.pool.submit(self._processRequest, request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _processRequest(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def close(self):
+        '''
+            Wait for the running requests and close the server.
+        '''
+        self.pool.shutdown(wait=True)
+        self.server_close()
+
+
+class PreforkServer:
+    '''
+        Minimal pre-forking server used when gunicorn is not installed.
+
+        The listening socket is opened once and shared by the worker
+        processes, each one serving the requests with a pool of threads.
+        On SIGTERM or SIGINT the workers stop accepting connections and
+        complete the running requests, the ones still running after the
+        graceful timeout are killed.
+        A worker that exits while the server is running is replaced.
+    '''
+
+    def __init__(self, app, host, port, workers, threads, graceful_timeout):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.graceful_timeout = graceful_timeout
+        self.socket = None
+        self.children = {}
+        self.stopping = False
+
+    def run(self):
+        self.socket = socket.create_server((self.host, self.port), backlog=128)
+        self.socket.setblocking(False)
+        log.info("Listening on %s:%d with %d workers, %d threads each" %
+                 (self.host, self.port, self.workers, self.threads))
+        for _ in range(self.workers):
+            self._spawn()
+        signal.signal(signal.SIGTERM, self._onStop)
+        signal.signal(signal.SIGINT, self._onStop)
+        signal.signal(signal.SIGALRM, self._onTimeout)
+        while len(self.children) > 0:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None:
+                # Not a worker, e.g. the library watcher
+                continue
+            if self.stopping:
+                continue
+            if status != 0 and time.monotonic() - started < WORKER_BOOT_TIME:
+                log.error("Worker %d failed on start, stopping the server" % pid)
+                self._onStop(None, None)
+                continue
+            log.warning("Worker %d exited with status %d, restarting" % (pid, status))
+            self._spawn()
+        self.socket.close()
+        log.info("Server stopped")
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                self._serve()
+            except Exception as e:
+                log.error("Worker %d failed: %s" % (os.getpid(), e))
+                status = 1
+            finally:
+                os._exit(status)
+        self.children[pid] = time.monotonic()
+
+    def _serve(self):
+        '''
+            Worker process: serve the requests until SIGTERM.
+        '''
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGALRM, signal.SIG_DFL)
+        disposeAfterFork()
+        server = PooledWSGIServer(self.host, self.port, self.app, self.threads,
+                                  fd=self.socket.fileno())
+        # shutdown waits for serve_forever to return, call it from another thread
+        stop = lambda signum, frame: Thread(target=server.shutdown, daemon=True).start()
+        signal.signal(signal.SIGTERM, stop)
+        server.serve_forever()
+        server.close()
+
+    def _onStop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        log.info("Stopping workers")
+        self._signalChildren(signal.SIGTERM)
+        signal.alarm(self.graceful_timeout)
+
+    def _onTimeout(self, signum, frame):
+        log.warning("Graceful timeout expired, killing %d workers" % len(self.children))
+        self._signalChildren(signal.SIGKILL)
+
+    def _signalChildren(self, signum):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self.children.pop(pid, None)
+
+
+def runDevelopment(app, host, port, debug=False):
+    '''
+        Serve the application with the Flask development server.
+    '''
+    app.run(host=host, port=port, debug=debug, threaded=True)
+
+def runProduction(app, host, port, workers, threads, keep_alive, graceful_timeout):
+    '''
+        Serve the application with worker processes, with gunicorn
+        if installed.
+
+        Each thread of a worker uses its own database session.
+        The database connections opened before the fork are
+        discarded in the workers.
+
+        :param flask.Flask app: Application
+        :param str host: Host
+        :param int port: Port
+        :param int workers: Number of worker processes
+        :param int threads: Number of threads of each worker
+        :param int keep_alive: Seconds an idle connection is kept open, gunicorn only
+        :param int graceful_timeout: Seconds to complete the running requests on shutdown
+    '''
+    if BaseApplication is None:
+        log.info("gunicorn not installed, using the pre-forking server")
+        PreforkServer(app, host, port, workers, threads, graceful_timeout).run()
+        return
+    options = {
+        'bind': "%s:%d" % (host, port),
+        'workers': workers,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'threads': threads,
+        'keepalive': keep_alive,
+        'graceful_timeout': graceful_timeout,
+        'post_fork': lambda server, worker: disposeAfterFork(),
+    }
+    GunicornApplication(app, options).run()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+from flask import request
+from marshmallow import ValidationError
+
+from .Common import BaseResource
+
+from src.dao import filesDao
+from src.web.Schemas import BulkTagsSchema
+from src.web.Schemas import BulkTagsResultSchema
+from src.web.Errors import BaseError
+
+STATUS_TAGGED = "tagged"
+STATUS_FOUND = "found"
+STATUS_NOT_FOUND = "not found"
+
+
+class BulkFileTags(BaseResource):
+
+    bulk_schema = BulkTagsSchema()
+    result_schema = BulkTagsResultSchema()
+
+    def get(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def put(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def delete(self, *args, **kwargs):
+        raise NotImplementedError()
+
+    def post(self):
+        '''
+            Add all the given tags to all the given files
+            in a single transaction.
+
+            :param array data: request data, files and tags ids
+            :return: The status of each file and tag
+        '''
+        json_data = request.get_json()
+        try:
+            data = self.bulk_schema.load(json_data)
+        except ValidationError:
+            error = BaseError(100, "Cannot load input data")
+            return self.marshal(error, self.schema_error), 400
+        try:
+            file_ids, tag_ids = filesDao.addTags(data["files"], data["tags"])
+        except Exception as e:
+            error = BaseError(300, "Cannot add tags to files. Error: %s" % e)
+            return self.marshal(error, self.schema_error), 400
+        files_status = STATUS_TAGGED if len(tag_ids) > 0 else STATUS_FOUND
+        result = {
+            "files": self._getItemsResult(data["files"], file_ids, files_status),
+            "tags": self._getItemsResult(data["tags"], tag_ids, STATUS_FOUND)
+        }
+        return self.marshal(result, self.result_schema)
+
+    def _getItemsResult(self, requested_ids, found_ids, status):
+        '''
+            Get the result of the request for each of the requested ids.
+
+            :param list of int requested_ids: Requested ids
+            :param set of int found_ids: Ids found in the database
+            :param str status: Status of the found ids
+            :return: Status for each id
+            :rtype: list of dict
+        '''
+        items = []
+        for eid in requested_ids:
+            items.append({
+                "id": eid,
+                "status": status if eid in found_ids else STATUS_NOT_FOUND
+            })
+        return items
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+
+from src.web.ResponseCache import responseCache
+from src.web.Schemas import CacheStatsSchema
+
+from .Common import CommonResource
+
+
+class CacheStats(CommonResource):
+
+    stats_schema = CacheStatsSchema()
+
+    def get(self):
+        '''
+            Return the hits and misses of the response cache
+            of the worker serving the request.
+
+            :rtype: dict
+        '''
+        return self.marshal(responseCache.getStats(), self.stats_schema)
@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
 
+import time
+
+from flask import Response
 from flask import request
+from flask import stream_with_context
 from flask_restful import Resource
+from werkzeug.http import http_date
 
+from src.Config import ConfigManager
+from src.Utils import json
+from src.dao import changeVersions
+from src.web import Serializers
+from src.web.ResponseCache import responseCache
 from src.web.Schemas import ErrorSchema
 from src.web.Errors import BaseError
 
+MIMETYPE_JSON = 'application/json'
+MIMETYPE_NDJSON = 'application/x-ndjson'
+
 
 class MarschalException(Exception):
     pass
@@ -19,11 +32,55 @@ class CommonResource(Resource):
         '''
             Convert the given data to JSON with the given schema.
 
+            The entity schemas use the compiled serializers.
+
             :param data: Data
             :param schema: Schema
             :return: JSON serialized data
         '''
-        return schema.dump(data)
+        return Serializers.dump(data, schema)
+
+    def stream(self, chunks, schema):
+        '''
+            Stream a list of entities, serialising one chunk at a time.
+            The list is sent as newline delimited JSON if the client
+            accepts application/x-ndjson, as a JSON array otherwise.
+
+            :param chunks: Iterable of lists of entities
+            :param schema: Schema with many=True
+            :return: Streamed response
+            :rtype: flask.Response
+        '''
+        if self.acceptsNDJSON():
+            return Response(stream_with_context(self._streamNDJSON(chunks, schema)),
+                            mimetype=MIMETYPE_NDJSON)
+        return Response(stream_with_context(self._streamArray(chunks, schema)),
+                        mimetype=MIMETYPE_JSON)
+
+    def acceptsNDJSON(self):
+        '''
+            Check if the client prefers newline delimited JSON.
+
+            :rtype: bool
+        '''
+        best = request.accept_mimetypes.best_match([MIMETYPE_JSON, MIMETYPE_NDJSON])
+        return best == MIMETYPE_NDJSON
+
+    def _streamNDJSON(self, chunks, schema):
+        for chunk in chunks:
+            yield ''.join(map(lambda item: json.dumps(item) + '\n', self.marshal(chunk, schema)))
+
+    def _streamArray(self, chunks, schema):
+        separator = '['
+        for chunk in chunks:
+            items = self.marshal(chunk, schema)
+            if len(items) > 0:
+                yield separator + ','.join(map(lambda item: json.dumps(item), items))
+                separator = ','
+        if separator == '[':
+            yield '[]\n'
+        else:
+            yield ']\n'
 
 
 class BaseResource(CommonResource):
@@ -34,16 +91,33 @@ class BaseResource(CommonResource):
     schema_create = None
     schema_update = None
     create_required_params = []
+    # Tables the list of resources is read from
+    versioned_tables = None
+    # Keep the versioned lists in the response cache
+    cached = False
 
     def get(self, eid=None):
         '''
             Execute a GET request with an optional parameter.
+            The list of resources has an ETag and a Last-Modified header
+            built from the versions of the tables it is read from and
+            is not read again if the client has the current version.
 
             :param int eid: Id of the resource
         '''
         if eid is None:
-            entities = self.getEntities()
-            return self.marshal(entities, self.schema_multi)
+            tables = self.getVersionedTables()
+            versions = None if tables is None else changeVersions.get(tables)
+            headers, modified = self.getValidators(versions)
+            if self.isNotModified(headers, modified):
+                return Response(status=304, headers=headers)
+            if self.isStreamRequested():
+                chunks = self.iterEntities()
+                if chunks is not None:
+                    response = self.stream(chunks, self.schema_multi)
+                    response.headers.extend(headers)
+                    return response
+            return self.getList(versions), 200, headers
         else:
             entity = self.getEntity(eid)
             return self.marshal(entity, self.schema_single)
@@ -130,6 +204,95 @@ class BaseResource(CommonResource):
         '''
         return self.dao.getAll()
 
+    def getVersionedTables(self):
+        '''
+            Get the tables the list of resources returned
+            by getEntities depends on.
+
+            :return: Table names, None if the list is not versioned
+            :rtype: list of str
+        '''
+        return self.versioned_tables
+
+    def getValidators(self, versions):
+        '''
+            Get the cache validators of the list of resources.
+
+            :param list of TableVersion versions: Versions of the tables
+                                                  returned by getVersionedTables
+            :return: ETag and Last-Modified headers, modification time
+                     (None if Last-Modified is not sent)
+            :rtype: dict, float
+        '''
+        if versions is None:
+            return {}, None
+        etag = '-'.join(map(lambda version: str(version.version), versions))
+        if self.acceptsNDJSON():
+            etag += '-ndjson'
+        headers = {'ETag': '"%s"' % etag, 'Vary': 'Accept'}
+        modified = None
+        for version in versions:
+            if version.modified is not None and (modified is None or version.modified > modified):
+                modified = version.modified
+        # Last-Modified has a precision of one second: a list changed in the
+        # current second could change again with the same Last-Modified,
+        # so it is only validated by the ETag
+        if modified is not None and time.time() - modified >= 1:
+            headers['Last-Modified'] = http_date(modified)
+        else:
+            modified = None
+        return headers, modified
+
+    def isNotModified(self, headers, modified):
+        '''
+            Check if the client has the current version of the list.
+
+            :param dict headers: Headers returned by getValidators
+            :param float modified: Modification time returned by getValidators
+            :rtype: bool
+        '''
+        if 'ETag' not in headers:
+            return False
+        if request.if_none_match:
+            return request.if_none_match.contains(headers['ETag'].strip('"'))
+        if request.if_modified_since is not None and modified is not None:
+            return int(modified) <= request.if_modified_since.timestamp()
+        return False
+
+    def getList(self, versions):
+        '''
+            Get the serialised list of resources, from the response
+            cache if the resource is cached.
+
+            :param list of TableVersion versions: Versions of the tables
+                                                  returned by getVersionedTables
+            :return: JSON serialised list
+        '''
+        if not self.cached or versions is None or not responseCache.isEnabled():
+            return self.marshal(self.getEntities(), self.schema_multi)
+        key = responseCache.createKey(type(self).__name__, request.args, versions)
+        data = responseCache.get(key)
+        if data is None:
+            data = self.marshal(self.getEntities(), self.schema_multi)
+            responseCache.put(key, data)
+        return data
+
+    def isStreamRequested(self):
+        '''
+            Check if the list of resources should be streamed.
+
+            :rtype: bool
+        '''
+        return ConfigManager.SERVER.getStream() or self.acceptsNDJSON()
+
+    def iterEntities(self):
+        '''
+            Iterate over the resources returned by getEntities in chunks.
+
+            :return: Iterable of lists of resources, None if the request cannot be streamed
+        '''
+        return self.dao.iterAll()
+
     def updateEntity(self, entity, data):
         '''
             Update an entity with the given data.
@@ -1,12 +1,54 @@
 #!/usr/bin/env python3
 
+import base64
+import binascii
+
 from flask import request
 
 from .Common import BaseResource
 
+from src.Utils import json
 from src.dao import filesDao
 from src.web.Schemas import FileSchema
 from src.web.Schemas import FileLazySchema
+from src.web.Errors import BaseError
+
+CURSOR_PAGE_SIZE = 100
+CURSOR_MAX_PAGE_SIZE = 1000
+CURSOR_HEADER = 'X-Next-Cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encodeCursor(file):
+    '''
+        Create the cursor pointing after the given file.
+
+        :param IFileLazy file: Last file of a page
+        :return: Opaque cursor
+        :rtype: str
+    '''
+    data = json.dumps([file.name, file.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def decodeCursor(cursor):
+    '''
+        Decode a cursor created with encodeCursor.
+
+        :param str cursor: Cursor
+        :return: Name and id of the last file of the previous page
+        :rtype: tuple
+    '''
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        name, fid = data
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if not isinstance(name, str) or not isinstance(fid, int):
+        raise InvalidCursor(cursor)
+    return name, fid
 
 
 class Files(BaseResource):
@@ -17,6 +59,20 @@ class Files(BaseResource):
     schema_create = FileLazySchema()
     schema_update = FileLazySchema()
     create_required_params = ["name"]
+    versioned_tables = ["Files", "FileTags"]
+    cached = True
+
+    def get(self, eid=None):
+        '''
+            Execute a GET request with an optional parameter.
+            If the cursor parameter is set return a page of files
+            and the cursor of the next page in the X-Next-Cursor header.
+
+            :param int eid: Id of the resource
+        '''
+        if eid is None and 'cursor' in request.args:
+            return self.getPage(request.args.get('cursor'))
+        return super().get(eid)
 
     def getEntities(self):
         '''
@@ -29,10 +85,72 @@ class Files(BaseResource):
         if random is not None:
             return self.dao.getRandom(limit)
         offset = request.args.get('offset')
+        name_like, tag_codes = self._getSearchParameters()
+        return self.dao.getByNameAndTags(name_like, tag_codes, offset=offset, limit=limit)
+
+    def getVersionedTables(self):
+        '''
+            Get the tables the list of files depends on,
+            random files are never the same.
+
+            :rtype: list of str
+        '''
+        if request.args.get('random') is not None:
+            return None
+        return self.versioned_tables
+
+    def iterEntities(self):
+        '''
+            Iterate over the files matching the search in chunks.
+            Random, offset and limit requests are not streamed.
+
+            :return: Iterable of lists of files or None
+        '''
+        for key in ['random', 'offset', 'limit']:
+            if request.args.get(key) is not None:
+                return None
+        name_like, tag_codes = self._getSearchParameters()
+        return self.dao.iterByNameAndTags(name_like, tag_codes)
+
+    def getPage(self, cursor):
+        '''
+            Get the page of files following the given cursor.
+            An empty cursor returns the first page.
+
+            :param str cursor: Cursor returned with the previous page
+            :return: Page of files and the headers with the next cursor
+        '''
+        after = None
+        if cursor:
+            try:
+                after = decodeCursor(cursor)
+            except InvalidCursor:
+                error = BaseError(100, "Invalid cursor")
+                return self.marshal(error, self.schema_error), 400
+        try:
+            limit = int(request.args.get('limit', CURSOR_PAGE_SIZE))
+        except ValueError:
+            error = BaseError(100, "Invalid limit")
+            return self.marshal(error, self.schema_error), 400
+        limit = min(max(limit, 1), CURSOR_MAX_PAGE_SIZE)
+        name_like, tag_codes = self._getSearchParameters()
+        files = self.dao.getByNameAndTags(name_like, tag_codes, limit=limit, after=after)
+        headers = {}
+        if len(files) > 0 and len(files) == limit:
+            headers[CURSOR_HEADER] = encodeCursor(files[-1])
+        return self.marshal(files, self.schema_multi), 200, headers
+
+    def _getSearchParameters(self):
+        '''
+            Get the name and tags filters from the request.
+
+            :return: Name pattern and tag codes
+            :rtype: str, list of int
+        '''
         name = request.args.get('name')
         name_like = None
         if name is not None:
             name_like = '%' + name.replace(' ', '%') + '%'
         tags = request.args.getlist('tags')
         tag_codes = list(map(lambda c: int(c), tags))
-        return self.dao.getByNameAndTags(name_like, tag_codes, offset=offset, limit=limit)
+        return name_like, tag_codes
@@ -16,3 +16,4 @@ class Metatags(BaseResource):
     schema_create = MetatagLazySchema()
     schema_update = MetatagLazySchema()
     create_required_params = ["name"]
+    versioned_tables = ["Metatags"]
@@ -5,6 +5,7 @@ from flask import request
 from src.dao import tagsDao
 from src.web.Schemas import TagSchema
 from src.web.Schemas import TagLazySchema
+from src.web.Schemas import TagFacetSchema
 
 from .Common import BaseResource
 
@@ -13,10 +14,12 @@ class Tags(BaseResource):
 
     dao = tagsDao
     schema_single = TagSchema()
-    schema_multi = TagLazySchema(many=True)
+    schema_multi = TagFacetSchema(many=True)
     schema_create = TagLazySchema()
     schema_update = TagLazySchema()
     create_required_params = ["name", "metatag"]
+    versioned_tables = ["Tags", "Metatags"]
+    cached = True
 
     def getEntities(self):
         '''
@@ -34,3 +37,25 @@ class Tags(BaseResource):
             name_like = "%" + name + "%"
         tag_codes = list(map(lambda c: int(c), related))
         return self.dao.getRelatedTags(tag_codes, name_like=name_like)
+
+    def getVersionedTables(self):
+        '''
+            Get the tables the list of tags depends on,
+            the related tags depend on the tagged files too.
+
+            :rtype: list of str
+        '''
+        if len(request.args.getlist('related')) > 0 or request.args.get('name'):
+            return self.versioned_tables + ["Files", "FileTags"]
+        return self.versioned_tables
+
+    def iterEntities(self):
+        '''
+            Iterate over all the tags in chunks.
+            The related tags are aggregated in a single query and not streamed.
+
+            :return: Iterable of lists of tags or None
+        '''
+        if len(request.args.getlist('related')) > 0 or request.args.get('name'):
+            return None
+        return self.dao.iterAll()
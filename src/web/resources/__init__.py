@@ -5,3 +5,5 @@ from .Tags import Tags
 from .Metatags import Metatags
 from .FileTags import FileTags
 from .FileList import FileList
+from .BulkFileTags import BulkFileTags
+from .CacheStats import CacheStats